@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from sqlalchemy import select, func, Numeric
+from sqlalchemy.dialects import postgresql, sqlite
+from models import AgregadoStatus, AgregadoReceitaDiaria, AgregadoItens, ItemPedido, arredondar_dinheiro
+
+# ===========================================
+# MANUTENÇÃO INCREMENTAL DOS AGREGADOS
+# ===========================================
+# Cada função soma (ou subtrai) a diferença causada por uma alteração de pedido, com um UPSERT
+# "valor = valor + diferença" executado pelo próprio banco. As rotas chamam essas funções antes do commit,
+# então os agregados mudam na mesma transação do pedido: ou os dois são gravados, ou nenhum.
+# Só os pedidos FINALIZADO entram na receita por dia e nos itens vendidos.
+
+
+def hoje():
+    # Dias contados em UTC, independentemente do fuso de cada worker
+    return datetime.now(timezone.utc).date()
+
+
+def somar_coluna(tabela, consulta, coluna):
+    soma = getattr(tabela, coluna) + getattr(consulta.excluded, coluna)
+    # Colunas de dinheiro são arredondadas a cada soma (as contagens são inteiras)
+    return arredondar_dinheiro(soma) if isinstance(tabela.__table__.c[coluna].type, Numeric) else soma
+
+
+async def somar(session, tabela, linhas, colunas_somadas):
+    # linhas: lista de dicionários com as chaves primárias e as diferenças; chaves repetidas não são permitidas
+    if not linhas:
+        return
+    # INSERT ... ON CONFLICT DO UPDATE existe no SQLite e no Postgres, mas cada dialeto tem a sua construção
+    insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    consulta = insert(tabela).values(linhas)
+    consulta = consulta.on_conflict_do_update(
+        index_elements=[coluna.name for coluna in tabela.__table__.primary_key],
+        set_={coluna: somar_coluna(tabela, consulta, coluna) for coluna in colunas_somadas},
+    )
+    await session.execute(consulta)
+
+
+async def somar_status(session, status, quantidade, valor):
+    await somar(session, AgregadoStatus, [{"status": status, "quantidade": quantidade, "valor": valor}], ("quantidade", "valor"))
+
+
+async def somar_receita(session, dia, pedidos, receita):
+    if dia is None:
+        return # Pedido finalizado antes da existência da coluna finalizado_em
+    await somar(session, AgregadoReceitaDiaria, [{"dia": dia, "pedidos": pedidos, "receita": receita}], ("pedidos", "receita"))
+
+
+async def somar_itens_do_pedido(session, id_pedido, sinal):
+    # Soma (sinal=1) ou subtrai (sinal=-1) todos os itens do pedido, já agrupados por sabor e tamanho
+    grupos = (await session.execute(
+        select(ItemPedido.sabor, ItemPedido.tamanho, func.sum(ItemPedido.quantidade), func.sum(ItemPedido.preco_unitario * ItemPedido.quantidade))
+        .where(ItemPedido.pedido == id_pedido)
+        .group_by(ItemPedido.sabor, ItemPedido.tamanho)
+    )).all()
+    linhas = [{"sabor": sabor, "tamanho": tamanho, "quantidade": sinal * quantidade, "receita": sinal * receita} for sabor, tamanho, quantidade, receita in grupos]
+    await somar(session, AgregadoItens, linhas, ("quantidade", "receita"))
+
+
+async def registrar_pedido_criado(session, pedido):
+    await somar_status(session, pedido.status, 1, pedido.preco)
+
+
+async def registrar_mudanca_status(session, pedido, novo_status):
+    # Altera o status do pedido e move os seus valores entre os agregados (o preço não muda aqui)
+    status_anterior = pedido.status
+    if status_anterior == novo_status:
+        return
+    await somar_status(session, status_anterior, -1, -pedido.preco)
+    await somar_status(session, novo_status, 1, pedido.preco)
+    if status_anterior == "FINALIZADO":
+        await somar_receita(session, pedido.finalizado_em, -1, -pedido.preco)
+        await somar_itens_do_pedido(session, pedido.id, -1)
+    pedido.status = novo_status
+    # Só pedidos encerrados (finalizados ou cancelados) entram no arquivamento, contando a partir desta data
+    pedido.encerrado_em = hoje() if novo_status in ("FINALIZADO", "CANCELADO") else None
+    if novo_status == "FINALIZADO":
+        pedido.finalizado_em = hoje()
+        await somar_receita(session, pedido.finalizado_em, 1, pedido.preco)
+        await somar_itens_do_pedido(session, pedido.id, 1)
+    else:
+        pedido.finalizado_em = None
+
+
+async def registrar_itens(session, pedido, itens, sinal=1):
+    # Itens adicionados (sinal=1) ou removidos (sinal=-1) de um pedido; itens: lista de (sabor, tamanho, quantidade, subtotal)
+    valor = sum((subtotal for _, _, _, subtotal in itens), 0)
+    await somar_status(session, pedido.status, 0, sinal * valor)
+    if pedido.status == "FINALIZADO":
+        await somar_receita(session, pedido.finalizado_em, 0, sinal * valor)
+        grupos = {}
+        for sabor, tamanho, quantidade, subtotal in itens:
+            soma = grupos.setdefault((sabor, tamanho), [0, 0])
+            soma[0] += quantidade
+            soma[1] += subtotal
+        linhas = [{"sabor": sabor, "tamanho": tamanho, "quantidade": sinal * quantidade, "receita": sinal * receita} for (sabor, tamanho), (quantidade, receita) in grupos.items()]
+        await somar(session, AgregadoItens, linhas, ("quantidade", "receita"))
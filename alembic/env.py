@@ -25,6 +25,11 @@ from models import Base
 
 target_metadata = Base.metadata
 
+# A URL do banco vem da mesma configuração usada pela aplicação (DATABASE_URL no ambiente ou no .env);
+# o valor do alembic.ini só é usado quando ela não estiver definida
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.getenv("DATABASE_URL").replace("%", "%%"))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
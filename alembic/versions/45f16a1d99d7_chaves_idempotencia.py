@@ -0,0 +1,38 @@
+"""chaves de idempotencia
+
+Revision ID: 45f16a1d99d7
+Revises: 9afa2af64479
+Create Date: 2026-10-18 11:38:52.210447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '45f16a1d99d7'
+down_revision: Union[str, None] = '9afa2af64479'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chaves_idempotencia',
+    sa.Column('chave', sa.String(), nullable=False),
+    sa.Column('hash_corpo', sa.String(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('tipo_conteudo', sa.String(), nullable=True),
+    sa.Column('corpo', sa.LargeBinary(), nullable=True),
+    sa.Column('expira_em', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    op.create_index(op.f('ix_chaves_idempotencia_expira_em'), 'chaves_idempotencia', ['expira_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_chaves_idempotencia_expira_em'), table_name='chaves_idempotencia')
+    op.drop_table('chaves_idempotencia')
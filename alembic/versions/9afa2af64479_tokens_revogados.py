@@ -0,0 +1,36 @@
+"""tokens revogados
+
+Revision ID: 9afa2af64479
+Revises: db0a6b3cb987
+Create Date: 2026-10-18 11:02:17.554810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9afa2af64479'
+down_revision: Union[str, None] = 'db0a6b3cb987'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tokens_revogados',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('identificador', sa.String(), nullable=False),
+    sa.Column('tipo', sa.String(), nullable=False),
+    sa.Column('expira_em', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tokens_revogados_expira_em'), 'tokens_revogados', ['expira_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tokens_revogados_expira_em'), table_name='tokens_revogados')
+    op.drop_table('tokens_revogados')
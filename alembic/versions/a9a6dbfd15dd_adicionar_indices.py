@@ -0,0 +1,35 @@
+"""adicionar indices nas colunas de busca
+
+Revision ID: a9a6dbfd15dd
+Revises: 69c769df6718
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9a6dbfd15dd'
+down_revision: Union[str, None] = '69c769df6718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O índice único falha se já existirem e-mails duplicados: remova as duplicatas antes de migrar
+    op.create_index(op.f('ix_usuarios_email'), 'usuarios', ['email'], unique=True)
+    op.create_index(op.f('ix_pedidos_usuario'), 'pedidos', ['usuario'], unique=False)
+    op.create_index(op.f('ix_pedidos_status'), 'pedidos', ['status'], unique=False)
+    op.create_index(op.f('ix_itens_pedido_pedido'), 'itens_pedido', ['pedido'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_itens_pedido_pedido'), table_name='itens_pedido')
+    op.drop_index(op.f('ix_pedidos_status'), table_name='pedidos')
+    op.drop_index(op.f('ix_pedidos_usuario'), table_name='pedidos')
+    op.drop_index(op.f('ix_usuarios_email'), table_name='usuarios')
@@ -0,0 +1,53 @@
+"""agregados para as analises de pedidos
+
+Revision ID: c3e8b52f7a14
+Revises: 45f16a1d99d7
+Create Date: 2026-10-18 13:05:27.418903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8b52f7a14'
+down_revision: Union[str, None] = '45f16a1d99d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('agregados_status',
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('valor', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('status')
+    )
+    op.create_table('agregados_receita_diaria',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('pedidos', sa.Integer(), nullable=False),
+    sa.Column('receita', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('dia')
+    )
+    op.create_table('agregados_itens',
+    sa.Column('sabor', sa.String(), nullable=False),
+    sa.Column('tamanho', sa.String(), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('receita', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('sabor', 'tamanho')
+    )
+    # Pedidos finalizados antes desta migração ficam sem data (entram nos totais por status, mas não na receita por dia)
+    op.add_column('pedidos', sa.Column('finalizado_em', sa.Date(), nullable=True))
+    # Preenche os agregados com os pedidos que já existem: python reconstruir_agregados.py
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('finalizado_em')
+    op.drop_table('agregados_itens')
+    op.drop_table('agregados_receita_diaria')
+    op.drop_table('agregados_status')
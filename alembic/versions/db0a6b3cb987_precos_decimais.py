@@ -0,0 +1,37 @@
+"""precos decimais
+
+Revision ID: db0a6b3cb987
+Revises: a9a6dbfd15dd
+Create Date: 2026-10-18 09:47:05.102934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'db0a6b3cb987'
+down_revision: Union[str, None] = 'a9a6dbfd15dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O total é atualizado com "preco = preco + diferenca", então não pode ficar nulo
+    op.execute("UPDATE pedidos SET preco = 0 WHERE preco IS NULL")
+    # batch_alter_table recria a tabela no SQLite, que não suporta ALTER COLUMN
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.alter_column('preco', existing_type=sa.Float(), type_=sa.Numeric(12, 2))
+    with op.batch_alter_table('itens_pedido') as batch_op:
+        batch_op.alter_column('preco_unitario', existing_type=sa.Float(), type_=sa.Numeric(12, 2))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('itens_pedido') as batch_op:
+        batch_op.alter_column('preco_unitario', existing_type=sa.Numeric(12, 2), type_=sa.Float())
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.alter_column('preco', existing_type=sa.Numeric(12, 2), type_=sa.Float())
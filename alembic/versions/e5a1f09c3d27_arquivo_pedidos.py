@@ -0,0 +1,72 @@
+"""arquivo de pedidos encerrados
+
+Revision ID: e5a1f09c3d27
+Revises: c3e8b52f7a14
+Create Date: 2026-10-18 16:42:08.271530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1f09c3d27'
+down_revision: Union[str, None] = 'c3e8b52f7a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pedidos', sa.Column('encerrado_em', sa.Date(), nullable=True))
+    op.create_index(op.f('ix_pedidos_encerrado_em'), 'pedidos', ['encerrado_em'], unique=False)
+    # Pedidos encerrados antes desta migração: usa o dia da finalização ou, sem ele, o dia da migração
+    # (assim eles só são arquivados depois de ARQUIVAR_APOS_DIAS contados a partir de hoje)
+    op.execute("UPDATE pedidos SET encerrado_em = finalizado_em WHERE status = 'FINALIZADO' AND finalizado_em IS NOT NULL")
+    op.execute("UPDATE pedidos SET encerrado_em = CURRENT_DATE WHERE status IN ('FINALIZADO', 'CANCELADO') AND encerrado_em IS NULL")
+    op.create_table('pedidos_arquivados',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('usuario', sa.Integer(), nullable=True),
+    sa.Column('preco', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('finalizado_em', sa.Date(), nullable=True),
+    sa.Column('encerrado_em', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pedidos_arquivados_usuario'), 'pedidos_arquivados', ['usuario'], unique=False)
+    op.create_table('itens_pedido_arquivados',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=True),
+    sa.Column('sabor', sa.String(), nullable=True),
+    sa.Column('tamanho', sa.String(), nullable=True),
+    sa.Column('preco_unitario', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('pedido', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['pedido'], ['pedidos_arquivados.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_itens_pedido_arquivados_pedido'), 'itens_pedido_arquivados', ['pedido'], unique=False)
+    # No SQLite, sem AUTOINCREMENT o próximo ID é max(id)+1: arquivar o pedido (ou item) de maior ID faria um
+    # registro novo reutilizar um ID que já está no arquivo. O Postgres usa sequências, que nunca voltam atrás.
+    if op.get_bind().dialect.name == 'sqlite':
+        for tabela in ('pedidos', 'itens_pedido'):
+            with op.batch_alter_table(tabela, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+                pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Os pedidos arquivados são perdidos no downgrade: rode "python arquivamento.py --restaurar" antes
+    if op.get_bind().dialect.name == 'sqlite':
+        for tabela in ('itens_pedido', 'pedidos'):
+            with op.batch_alter_table(tabela, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+                pass
+    op.drop_index(op.f('ix_itens_pedido_arquivados_pedido'), table_name='itens_pedido_arquivados')
+    op.drop_table('itens_pedido_arquivados')
+    op.drop_index(op.f('ix_pedidos_arquivados_usuario'), table_name='pedidos_arquivados')
+    op.drop_table('pedidos_arquivados')
+    op.drop_index(op.f('ix_pedidos_encerrado_em'), table_name='pedidos')
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('encerrado_em')
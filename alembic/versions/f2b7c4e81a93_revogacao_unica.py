@@ -0,0 +1,33 @@
+"""revogacao unica por identificador
+
+Revision ID: f2b7c4e81a93
+Revises: e5a1f09c3d27
+Create Date: 2026-10-18 19:12:44.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c4e81a93'
+down_revision: Union[str, None] = 'e5a1f09c3d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Revogações repetidas (ex: dois logouts da mesma família) viram um único registro antes de criar o índice
+    op.execute(
+        "DELETE FROM tokens_revogados WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tokens_revogados GROUP BY tipo, identificador)"
+    )
+    op.create_index('ix_tokens_revogados_tipo_identificador', 'tokens_revogados', ['tipo', 'identificador'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tokens_revogados_tipo_identificador', table_name='tokens_revogados')
@@ -0,0 +1,91 @@
+from fastapi import FastAPI # Importa a classe FastAPI para criar a aplicação web
+from contextlib import asynccontextmanager # Define o que roda na inicialização e no encerramento da aplicação
+from fastapi.responses import ORJSONResponse # Resposta JSON serializada pelo orjson (bem mais rápido que o json padrão)
+from sqlalchemy import text
+import asyncio
+import logging
+import time
+import config # Carrega o .env antes dos demais módulos lerem as suas configurações
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================
+# AQUECIMENTO DO WORKER
+# ===========================================
+# Abre conexões do pool antecipadamente, para que as primeiras requisições não paguem a conexão com o banco
+# (e, no SQLite, os PRAGMAs aplicados em cada conexão nova)
+async def aquecer_conexoes(fabrica_sessao, quantidade):
+    async def abrir():
+        async with fabrica_sessao() as session:
+            await session.execute(text("SELECT 1"))
+    # Sessões simultâneas: cada uma retira uma conexão diferente do pool
+    await asyncio.gather(*(abrir() for _ in range(quantidade)))
+
+
+# Inicialização: cria os engines, aquece o bcrypt e as conexões, carrega as revogações de tokens salvas no
+# banco, mantém os workers sincronizados (revogações e eventos de pedidos) e, se ligada, inicia a fila de escrita
+# em lote e o arquivamento automático. O uvicorn só aceita requisições depois que esse trecho termina.
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    from dependencies import SessionAsync, iniciar_banco
+    from revogacao import sincronizar_revogacoes, limpar_revogacoes_expiradas, manter_revogacoes_sincronizadas
+    from idempotencia import limpar_chaves_expiradas
+    from eventos import manter_eventos_sincronizados
+    from senhas import aquecer_bcrypt
+    from escrita_em_lote import ESCRITA_EM_LOTE, fila_escrita
+    from arquivamento import ARQUIVAMENTO_AUTOMATICO, manter_pedidos_arquivados
+    inicio = time.perf_counter()
+    iniciar_banco()
+    aquecimentos = [aquecer_conexoes(SessionAsync, config.AQUECER_CONEXOES)]
+    if config.AQUECER_BCRYPT:
+        aquecimentos.append(aquecer_bcrypt()) # Roda na thread do bcrypt enquanto as conexões são abertas
+    await asyncio.gather(*aquecimentos)
+    async with SessionAsync() as session:
+        await limpar_revogacoes_expiradas(session)
+        await sincronizar_revogacoes(session)
+        await limpar_chaves_expiradas(session)
+    tarefa_revogacoes = asyncio.create_task(manter_revogacoes_sincronizadas(SessionAsync))
+    tarefa_eventos = asyncio.create_task(manter_eventos_sincronizados(SessionAsync))
+    if ESCRITA_EM_LOTE:
+        fila_escrita.iniciar(SessionAsync) # Group commit das alterações de pedidos
+    tarefa_arquivamento = asyncio.create_task(manter_pedidos_arquivados(SessionAsync)) if ARQUIVAMENTO_AUTOMATICO else None
+    logger.info("Worker pronto em %.1f ms", (time.perf_counter() - inicio) * 1000)
+    yield
+    await fila_escrita.encerrar() # Grava as alterações que ainda estão na fila antes de encerrar
+    tarefa_revogacoes.cancel()
+    tarefa_eventos.cancel()
+    if tarefa_arquivamento is not None:
+        tarefa_arquivamento.cancel()
+
+
+# ===========================================
+# FÁBRICA DA APLICAÇÃO
+# ===========================================
+# Só o main.py e o servidor.py importam este arquivo; as configurações que antes ficavam no main.py estão em
+# config.py, então rotas e dependências não importam mais o main (sem importações circulares)
+def criar_app():
+    from idempotencia import MiddlewareIdempotencia
+    from limite_requisicoes import MiddlewareLimiteRequisicoes
+    from metricas import MiddlewareMetricas, metricas_router
+    from auth_routes import auth_router # Rotas relacionadas à autenticação
+    from order_routes import order_router # Rotas relacionadas a pedidos (orders)
+
+    # Cria a aplicação FastAPI, usando o orjson para serializar todas as respostas
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=ciclo_de_vida)
+
+    # Middleware que devolve a resposta salva quando um POST de /pedidos é repetido com o mesmo Idempotency-Key
+    app.add_middleware(MiddlewareIdempotencia)
+
+    # Middleware que recusa com 429 o excesso de requisições por IP e por usuário (antes do bcrypt e do banco)
+    app.add_middleware(MiddlewareLimiteRequisicoes)
+
+    # Middleware que mede o tempo, as instruções SQL de cada rota e expõe tudo em /metrics
+    # (adicionado por último para ficar por fora e medir também as respostas repetidas)
+    app.add_middleware(MiddlewareMetricas)
+
+    # Adiciona as rotas de autenticação, de pedidos e de métricas (formato do Prometheus) à aplicação
+    app.include_router(auth_router)
+    app.include_router(order_router)
+    app.include_router(metricas_router)
+    return app
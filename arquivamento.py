@@ -0,0 +1,144 @@
+# ===========================================
+# ARQUIVAMENTO DOS PEDIDOS ENCERRADOS
+# ===========================================
+# Pedidos FINALIZADO ou CANCELADO encerrados há mais de ARQUIVAR_APOS_DIAS são movidos (com os itens) de
+# pedidos/itens_pedido para pedidos_arquivados/itens_pedido_arquivados. As tabelas principais ficam só com os
+# pedidos recentes, então as consultas, índices e backups delas não crescem para sempre. As rotas de leitura
+# procuram no arquivo quando o pedido não está nas tabelas principais; os agregados das análises não mudam.
+#
+# O movimento é feito em lotes de ARQUIVAMENTO_LOTE pedidos, cada um numa transação curta (INSERT ... SELECT
+# e DELETE executados pelo banco), com uma pausa entre os lotes para as escritas das rotas passarem.
+#
+# Para rodar (a partir da raiz do projeto):
+#   python arquivamento.py [--dias 90] [--lote 500]
+#   python arquivamento.py --restaurar   (devolve todos os pedidos arquivados às tabelas principais)
+# Ou, com ARQUIVAMENTO_AUTOMATICO=true, cada worker roda o arquivamento a cada ARQUIVAMENTO_INTERVALO_SEGUNDOS.
+import argparse
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from sqlalchemy import select, insert, delete
+from models import Pedido, ItemPedido, PedidoArquivado, ItemPedidoArquivado
+from agregados import hoje
+from metricas import pedidos_arquivados
+
+# Configurações do arquivamento (podem ser ajustadas no arquivo .env)
+ARQUIVAR_APOS_DIAS = int(os.getenv("ARQUIVAR_APOS_DIAS", "90")) # Dias desde o encerramento até o pedido ser arquivado
+ARQUIVAMENTO_LOTE = int(os.getenv("ARQUIVAMENTO_LOTE", "500")) # Pedidos movidos em cada transação
+ARQUIVAMENTO_PAUSA_MS = float(os.getenv("ARQUIVAMENTO_PAUSA_MS", "50")) # Pausa entre os lotes
+ARQUIVAMENTO_AUTOMATICO = os.getenv("ARQUIVAMENTO_AUTOMATICO", "false").lower() == "true" # Roda o arquivamento nos workers
+ARQUIVAMENTO_INTERVALO_SEGUNDOS = float(os.getenv("ARQUIVAMENTO_INTERVALO_SEGUNDOS", "3600")) # Intervalo do arquivamento automático
+
+# Só pedidos nesses status são arquivados (e, portanto, só eles podem estar no arquivo)
+STATUS_ARQUIVAVEIS = ("FINALIZADO", "CANCELADO")
+
+# As tabelas de arquivo têm exatamente as colunas das tabelas principais
+COLUNAS_PEDIDO = ["id", "status", "usuario", "preco", "finalizado_em", "encerrado_em"]
+COLUNAS_ITEM = ["id", "quantidade", "sabor", "tamanho", "preco_unitario", "pedido"]
+
+logger = logging.getLogger(__name__)
+
+
+def pode_estar_arquivado(status):
+    # Listagens filtradas por um status que nunca é arquivado (ex: PENDENTE) não precisam consultar o arquivo
+    return status is None or status in STATUS_ARQUIVAVEIS
+
+
+async def mover_pedidos(session, ids, origem, itens_origem, destino, itens_destino):
+    # Copia os pedidos e os itens para as tabelas de destino e apaga da origem, sem passar os dados pelo Python
+    sem_sincronizar = {"synchronize_session": False} # Nenhum desses objetos está carregado na sessão
+    await session.execute(insert(destino).from_select(
+        COLUNAS_PEDIDO, select(*(getattr(origem, coluna) for coluna in COLUNAS_PEDIDO)).where(origem.id.in_(ids))
+    ))
+    await session.execute(insert(itens_destino).from_select(
+        COLUNAS_ITEM, select(*(getattr(itens_origem, coluna) for coluna in COLUNAS_ITEM)).where(itens_origem.pedido.in_(ids))
+    ))
+    await session.execute(delete(itens_origem).where(itens_origem.pedido.in_(ids)), execution_options=sem_sincronizar)
+    await session.execute(delete(origem).where(origem.id.in_(ids)), execution_options=sem_sincronizar)
+
+
+async def arquivar_lote(session, limite_data, tamanho):
+    # No Postgres, os pedidos escolhidos ficam travados até o commit e os já travados por uma rota são pulados;
+    # no SQLite, se uma rota alterar um deles antes do INSERT, o lote falha com "database is locked" e nada é movido
+    ids = (await session.scalars(
+        select(Pedido.id)
+        .where(Pedido.status.in_(STATUS_ARQUIVAVEIS), Pedido.encerrado_em < limite_data)
+        .order_by(Pedido.id)
+        .limit(tamanho)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if ids:
+        await mover_pedidos(session, ids, Pedido, ItemPedido, PedidoArquivado, ItemPedidoArquivado)
+    await session.commit()
+    return len(ids)
+
+
+async def restaurar_lote(session, tamanho):
+    ids = (await session.scalars(select(PedidoArquivado.id).order_by(PedidoArquivado.id).limit(tamanho))).all()
+    if ids:
+        await mover_pedidos(session, ids, PedidoArquivado, ItemPedidoArquivado, Pedido, ItemPedido)
+    await session.commit()
+    return len(ids)
+
+
+async def arquivar(fabrica_sessao, dias=ARQUIVAR_APOS_DIAS, tamanho=ARQUIVAMENTO_LOTE, pausa_ms=ARQUIVAMENTO_PAUSA_MS):
+    # Arquiva lote por lote até não sobrar pedido antigo; devolve quantos pedidos foram movidos
+    limite_data = hoje() - timedelta(days=dias)
+    total = 0
+    while True:
+        async with fabrica_sessao() as session:
+            movidos = await arquivar_lote(session, limite_data, tamanho)
+        total += movidos
+        pedidos_arquivados.somar(movidos)
+        if movidos < tamanho:
+            return total
+        await asyncio.sleep(pausa_ms / 1000) # Dá a vez às escritas das rotas entre um lote e outro
+
+
+async def restaurar(fabrica_sessao, tamanho=ARQUIVAMENTO_LOTE, pausa_ms=ARQUIVAMENTO_PAUSA_MS):
+    total = 0
+    while True:
+        async with fabrica_sessao() as session:
+            movidos = await restaurar_lote(session, tamanho)
+        total += movidos
+        if movidos < tamanho:
+            return total
+        await asyncio.sleep(pausa_ms / 1000)
+
+
+async def manter_pedidos_arquivados(fabrica_sessao):
+    # Tarefa de fundo iniciada junto com a aplicação quando ARQUIVAMENTO_AUTOMATICO=true
+    while True:
+        await asyncio.sleep(ARQUIVAMENTO_INTERVALO_SEGUNDOS)
+        try:
+            total = await arquivar(fabrica_sessao)
+            if total:
+                logger.info("%d pedidos encerrados arquivados", total)
+        except Exception:
+            # Ex: outro worker arquivando ao mesmo tempo no SQLite; o restante fica para a próxima rodada
+            logger.exception("Falha ao arquivar os pedidos encerrados")
+
+
+if __name__ == "__main__":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from models import criar_engines
+
+    parser = argparse.ArgumentParser(description="Move os pedidos encerrados antigos para as tabelas de arquivo")
+    parser.add_argument("--dias", type=int, default=ARQUIVAR_APOS_DIAS, help="Arquiva pedidos encerrados há mais dias que isso")
+    parser.add_argument("--lote", type=int, default=ARQUIVAMENTO_LOTE)
+    parser.add_argument("--restaurar", action="store_true", help="Devolve todos os pedidos arquivados às tabelas principais")
+    args = parser.parse_args()
+
+    async def executar():
+        _, db_async = criar_engines()
+        fabrica_sessao = async_sessionmaker(db_async, expire_on_commit=False)
+        try:
+            if args.restaurar:
+                print(f"{await restaurar(fabrica_sessao, args.lote)} pedidos restaurados")
+            else:
+                print(f"{await arquivar(fabrica_sessao, args.dias, args.lote)} pedidos arquivados")
+        finally:
+            await db_async.dispose()
+
+    asyncio.run(executar())
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException # Importa ferramentas do FastAPI para criar rotas, injetar dependências e lançar exceções HTTP
 from models import Usuario # Importa o modelo de usuário do banco de dados
-from dependencies import pegar_sessao, verificar_token # Importa funções auxiliares: uma para abrir a sessão do banco e outra para verificar o token JWT
-from main import bcrypt_context, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY # Importa variáveis de configuração definidas em main.py
+from dependencies import pegar_sessao_async, decodificar_token, carregar_usuario, repetir_se_bloqueado, oauth2_schema # Importa funções auxiliares: uma para abrir a sessão assíncrona do banco e outra para verificar o token JWT
+from config import ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY # Importa variáveis de configuração definidas em config.py
+from revogacao import revogar, sincronizar_revogacoes, token_revogado, familia_revogada # Revogação de tokens (logout e rotação do refresh token)
+from senhas import gerar_hash_senha, verificar_senha # Hash e verificação de senhas executados fora do event loop
 from schemas import UsuarioSchema, LoginSchema # Importa schemas Pydantic para validar os dados de entrada
-from sqlalchemy.orm import Session # Importa o tipo de sessão do SQLAlchemy
+from sqlalchemy import select # Monta as consultas no estilo do SQLAlchemy 2.0
+from sqlalchemy.exc import IntegrityError # Erro lançado pelo banco ao violar o índice único do e-mail
+from sqlalchemy.ext.asyncio import AsyncSession # Importa o tipo de sessão assíncrona do SQLAlchemy
 from jose import jwt, JWTError # Importa funções e exceções da biblioteca JOSE para lidar com JWT
 from datetime import datetime, timedelta, timezone # Para manipular datas de expiração dos tokens
 from fastapi.security import OAuth2PasswordRequestForm # Permite autenticar via formulário (usado pelo padrão OAuth2)
+import time
+import uuid # Gera os identificadores únicos dos tokens (jti) e das famílias de tokens
 
 # Cria um roteador FastAPI com prefixo /auth e agrupa sob a tag "auth"
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
@@ -14,11 +20,16 @@ auth_router = APIRouter(prefix="/auth", tags=["auth"])
 # ===========================================
 # FUNÇÂO PARA CRIAR TOKENS JWT
 # ===========================================
-def criar_token(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
+def criar_token(usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), tipo="access", familia=None):
     # Define a data de expiração do token somando a duração atual
     data_expiracao = datetime.now(timezone.utc) + duracao_token
-    # Cria o payload com o ID do usuário (sub) e expiração (exp)
-    dic_info = {"sub": str(id_usuario), "exp": data_expiracao}
+    # Cria o payload com o ID do usuário (sub), expiração (exp), tipo do token (typ: access ou refresh),
+    # identificador único (jti), família (fam: todos os tokens de um mesmo login) e as permissões usadas no modo stateless
+    dic_info = {
+        "sub": str(usuario.id), "exp": data_expiracao, "typ": tipo,
+        "jti": uuid.uuid4().hex, "fam": familia or uuid.uuid4().hex,
+        "admin": bool(usuario.admin), "ativo": bool(usuario.ativo)
+    }
     # Codifica o JWT com o payload, chave secreta e algoritmo
     jwt_codificado = jwt.encode(dic_info, SECRET_KEY, ALGORITHM)
     return jwt_codificado
@@ -27,13 +38,13 @@ def criar_token(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_
 # ===========================================
 # FUNÇÂO PARA AUTENTICAR USUÁRIOS
 # ===========================================
-def autenticar_usuario(email, senha, session):
+async def autenticar_usuario(email, senha, session):
     # Busca o usuário no banco de dados pelo e-mail
-    usuario = session.query(Usuario).filter(Usuario.email == email).first()
+    usuario = await session.scalar(select(Usuario).where(Usuario.email == email))
     if not usuario:
         return False
     # Verifica se a senha informada bate com o hash no banco
-    if not bcrypt_context.verify(senha, usuario.senha):
+    if not await verificar_senha(senha, usuario.senha):
         return False
     return usuario # Retorna o objeto do usuário se autenticado com sucesso
 
@@ -53,19 +64,26 @@ async def home():
 # ROTA PARA CRIAR CONTA (REGISTRO)
 # ===========================================
 @auth_router.post("/criar_conta")
-async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(pegar_sessao)):
-    # Verifica se já existe um usuário com o mesmo e-mail
-    usuario = session.query(Usuario).filter(Usuario.email == usuario_schema.email).first()
+@repetir_se_bloqueado
+async def criar_conta(usuario_schema: UsuarioSchema, session: AsyncSession = Depends(pegar_sessao_async)):
+    # Verifica se já existe um usuário com o mesmo e-mail (evita gastar um hash bcrypt à toa;
+    # quem garante a unicidade de verdade é o índice único em usuarios.email)
+    usuario = await session.scalar(select(Usuario).where(Usuario.email == usuario_schema.email))
     if usuario:
         raise HTTPException(status_code=400, detail="E-mail do usuário já cadastrado")
     else:
         # Criptografa a senha do novo usuário
-        senha_criptografada = bcrypt_context.hash(usuario_schema.senha)
+        senha_criptografada = await gerar_hash_senha(usuario_schema.senha)
         # Cria um novo objeto de usuário
         novo_usuario = Usuario(usuario_schema.nome, usuario_schema.email, senha_criptografada, usuario_schema.ativo, usuario_schema.admin)
         # Adiciona e salva no banco
         session.add(novo_usuario)
-        session.commit()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Outra requisição cadastrou o mesmo e-mail entre a verificação e o commit
+            await session.rollback()
+            raise HTTPException(status_code=400, detail="E-mail do usuário já cadastrado")
         return {"mensagem": f"usuário cadastrado com sucesso {usuario_schema.email}"}
 
 
@@ -73,15 +91,16 @@ async def criar_conta(usuario_schema: UsuarioSchema, session: Session = Depends(
 # ROTA DE LOGIN VIA JSON
 # ===========================================
 @auth_router.post("/login")
-async def login(login_schema: LoginSchema, session: Session = Depends(pegar_sessao)):
+async def login(login_schema: LoginSchema, session: AsyncSession = Depends(pegar_sessao_async)):
     # Tenta autenticar o usuário com e-mail e senha
-    usuario = autenticar_usuario(login_schema.email, login_schema.senha, session)
+    usuario = await autenticar_usuario(login_schema.email, login_schema.senha, session)
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário não encontrado ou credenciais inválidas")
     else:
-        # Gera access token (curto prazo) e refresh token (mais longo)
-        access_token = criar_token(usuario.id)
-        refresh_token = criar_token(usuario.id, duracao_token=timedelta(days=7))
+        # Gera access token (curto prazo) e refresh token (mais longo), ambos da mesma família
+        familia = uuid.uuid4().hex
+        access_token = criar_token(usuario, familia=familia)
+        refresh_token = criar_token(usuario, duracao_token=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), tipo="refresh", familia=familia)
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -93,14 +112,14 @@ async def login(login_schema: LoginSchema, session: Session = Depends(pegar_sess
 # ROTA DE LOGIN VIA FORMULÁRIO (OAuth2)
 # ===========================================
 @auth_router.post("/login-form")
-async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(pegar_sessao)):
+async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(pegar_sessao_async)):
     # O formulário envia username (email) e password
-    usuario = autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
+    usuario = await autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário não encontrado ou credenciais inválidas")
     else:
         # Retorna apenas o access_token nesse endpoint
-        access_token = criar_token(usuario.id)
+        access_token = criar_token(usuario)
         return {
             "access_token": access_token,
             "token_type": "Bearer"
@@ -108,13 +127,44 @@ async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), se
 
 
 # ===========================================
-# ROTA DE REFRESH TOKEN
+# ROTA DE REFRESH TOKEN (COM ROTAÇÃO)
 # ===========================================
 @auth_router.get("/refresh")
-async def use_refresh_token(usuario: Usuario = Depends(verificar_token)):
-    # Cria um novo access token usando o usuário autenticado via refresh
-    access_token = criar_token(usuario.id)
+@repetir_se_bloqueado
+async def use_refresh_token(token: str = Depends(oauth2_schema), session: AsyncSession = Depends(pegar_sessao_async)):
+    # Cada refresh token só pode ser usado uma vez: ele é revogado e um novo par de tokens é emitido
+    dic_info = decodificar_token(token, "refresh", checar_revogacao=False)
+    if "jti" not in dic_info or "fam" not in dic_info:
+        raise HTTPException(status_code=401, detail="Acesso Negado, faça login novamente")
+    # A rota não é frequente, então consulta o banco para enxergar revogações feitas por outros workers
+    await sincronizar_revogacoes(session)
+    if familia_revogada(dic_info["fam"]):
+        raise HTTPException(status_code=401, detail="Acesso Negado, token revogado")
+    # O refresh token é revogado antes de qualquer token novo ser emitido. Se ele já tinha sido trocado (mesmo
+    # por uma requisição simultânea, em qualquer worker), o índice único recusa o INSERT: é um reuso
+    if token_revogado(dic_info["jti"]) or not await revogar(session, dic_info["jti"], "token", dic_info["exp"]):
+        # Reuso de um refresh token já trocado: o token pode ter sido roubado, então toda a família é revogada
+        await revogar(session, dic_info["fam"], "familia", time.time() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+        raise HTTPException(status_code=401, detail="Acesso Negado, reuso de refresh token detectado")
+    usuario = await carregar_usuario(dic_info, session)
+    access_token = criar_token(usuario, familia=dic_info["fam"])
+    refresh_token = criar_token(usuario, duracao_token=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), tipo="refresh", familia=dic_info["fam"])
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "Bearer"
-    }
\ No newline at end of file
+    }
+
+
+# ===========================================
+# ROTA DE LOGOUT
+# ===========================================
+@auth_router.post("/logout")
+@repetir_se_bloqueado
+async def logout(token: str = Depends(oauth2_schema), session: AsyncSession = Depends(pegar_sessao_async)):
+    # Recebe o refresh token e revoga toda a família (o refresh token e os access tokens emitidos com ele)
+    dic_info = decodificar_token(token, "refresh")
+    if "fam" not in dic_info:
+        raise HTTPException(status_code=401, detail="Acesso Negado, faça login novamente")
+    await revogar(session, dic_info["fam"], "familia", time.time() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+    return {"mensagem": "Logout realizado com sucesso"}
\ No newline at end of file
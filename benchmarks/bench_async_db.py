@@ -0,0 +1,90 @@
+# ===========================================
+# BENCHMARK: SESSÃO SÍNCRONA x SESSÃO ASSÍNCRONA
+# ===========================================
+# Dispara requisições concorrentes contra duas rotas que fazem a mesma consulta em "pedidos":
+# uma usando a sessão síncrona (pegar_sessao, que bloqueia o event loop) e outra usando a
+# sessão assíncrona (pegar_sessao_async). Ao mesmo tempo, mede a latência de uma rota leve
+# ("/ping") para mostrar o quanto as consultas bloqueantes atrasam as demais requisições.
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_async_db.py --requisicoes 500 --concorrencia 50
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dependencies import pegar_sessao, pegar_sessao_async, iniciar_banco
+from models import Pedido
+
+iniciar_banco() # Cria os engines usados pelas duas dependências (na aplicação, isso é feito no lifespan)
+
+app = FastAPI()
+
+@app.get("/sync")
+async def rota_sync(session: Session = Depends(pegar_sessao)):
+    # Mesmo padrão das rotas antigas: consulta bloqueante dentro de uma rota async
+    return {"total": len(session.query(Pedido).all())}
+
+@app.get("/async")
+async def rota_async(session: AsyncSession = Depends(pegar_sessao_async)):
+    return {"total": len((await session.scalars(select(Pedido))).all())}
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+def percentil(latencias, p):
+    # Percentil pelo método "nearest-rank"
+    ordenadas = sorted(latencias)
+    indice = max(0, int(round(p / 100 * len(ordenadas))) - 1)
+    return ordenadas[indice]
+
+
+async def medir(cliente, rota, requisicoes, concorrencia):
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias_rota, latencias_ping = [], []
+
+    async def uma_requisicao(url, destino):
+        async with semaforo:
+            inicio = time.perf_counter()
+            resposta = await cliente.get(url)
+            resposta.raise_for_status()
+            destino.append((time.perf_counter() - inicio) * 1000)
+
+    tarefas = []
+    for _ in range(requisicoes):
+        tarefas.append(uma_requisicao(rota, latencias_rota))
+        tarefas.append(uma_requisicao("/ping", latencias_ping))
+    await asyncio.gather(*tarefas)
+    return latencias_rota, latencias_ping
+
+
+async def rodar(requisicoes, concorrencia):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        for rota in ("/sync", "/async"):
+            await medir(cliente, rota, 10, 5)  # aquecimento (conexões do pool e caches do SQLite)
+            latencias_rota, latencias_ping = await medir(cliente, rota, requisicoes, concorrencia)
+            for nome, latencias in ((rota, latencias_rota), (f"/ping durante {rota}", latencias_ping)):
+                print(
+                    f"{nome:<22} p50={statistics.median(latencias):8.2f} ms  "
+                    f"p99={percentil(latencias, 99):8.2f} ms  max={max(latencias):8.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara a latência p99 da sessão síncrona e da assíncrona")
+    parser.add_argument("--requisicoes", type=int, default=500)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(rodar(args.requisicoes, args.concorrencia))
\ No newline at end of file
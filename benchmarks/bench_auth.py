@@ -0,0 +1,66 @@
+# ===========================================
+# BENCHMARK: CUSTO DA AUTENTICAÇÃO POR REQUISIÇÃO
+# ===========================================
+# Mede o custo de autenticar uma requisição com o cache de tokens frio (jwt.decode completo a cada
+# chamada) e quente (token já verificado), tanto na função isolada quanto numa requisição inteira
+# à rota GET /pedidos/ (que só faz a autenticação).
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_auth.py
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def medir_requisicoes(cliente, cabecalhos, repeticoes, limpar_caches):
+    import dependencies
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        if limpar_caches:
+            dependencies.cache_tokens.limpar()
+        resposta = await cliente.get("/pedidos/", headers=cabecalhos)
+        resposta.raise_for_status()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+async def rodar():
+    import httpx
+    from sqlalchemy import insert
+    from main import app
+    from models import Base, Usuario
+    from auth_routes import criar_token
+    import dependencies
+
+    db, _ = dependencies.iniciar_banco()
+    Base.metadata.create_all(db)
+    with db.begin() as conexao:
+        conexao.execute(insert(Usuario).values(id=1, nome="bench", email="bench@bench.com", senha="x", ativo=True, admin=False))
+    token = criar_token(dependencies.UsuarioAutenticado(1, False, True))
+
+    repeticoes = 20000
+    frio = min(timeit.repeat(lambda: (dependencies.cache_tokens.limpar(), dependencies.decodificar_token(token, "access")), number=repeticoes, repeat=3)) / repeticoes
+    quente = min(timeit.repeat(lambda: dependencies.decodificar_token(token, "access"), number=repeticoes, repeat=3)) / repeticoes
+    print(f"decodificar_token   frio={frio * 1_000_000:8.1f} µs  quente={quente * 1_000_000:8.1f} µs")
+
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+    transporte = httpx.ASGITransport(app=app)
+    # O ASGITransport não executa o lifespan, então a inicialização do worker é feita aqui
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        await medir_requisicoes(cliente, cabecalhos, 100, False) # Aquecimento
+        frio = await medir_requisicoes(cliente, cabecalhos, 2000, True)
+        quente = await medir_requisicoes(cliente, cabecalhos, 2000, False)
+    print(f"GET /pedidos/       frio={frio * 1_000_000:8.1f} µs  quente={quente * 1_000_000:8.1f} µs  (por requisição)")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as pasta:
+        # A URL precisa estar no ambiente antes de importar a aplicação
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'auth.db')}"
+        os.environ.pop("DATABASE_URL_ASYNC", None)
+        os.environ["LIMITE_ATIVO"] = "false" # O limite de requisições recusaria a carga gerada pelo próprio teste
+        sys.path.append(RAIZ)
+        asyncio.run(rodar())
\ No newline at end of file
@@ -0,0 +1,111 @@
+# ===========================================
+# BENCHMARK: VAZÃO DE ESCRITA COM 1 A 8 WORKERS
+# ===========================================
+# Para cada quantidade de workers, sobe o servidor (servidor.py) numa pasta temporária com um banco
+# novo, dispara criações de pedido e inclusões de itens em paralelo durante alguns segundos e mede
+# quantas escritas por segundo foram concluídas e quantas falharam (ex: "database is locked").
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_escrita_workers.py --segundos 10
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(RAIZ)
+
+import httpx
+from jose import jwt
+from sqlalchemy import create_engine, insert
+
+from config import SECRET_KEY, ALGORITHM
+from models import Base, Usuario
+
+
+def preparar_banco(pasta):
+    # O servidor usa "sqlite:///banco.db", relativo à pasta em que é iniciado
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, 'banco.db')}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Usuario).values(id=1, nome="bench", email="bench@bench.com", senha="x", ativo=True, admin=True))
+    engine.dispose()
+
+
+def gerar_token():
+    expiracao = datetime.now(timezone.utc) + timedelta(hours=1)
+    return jwt.encode({"sub": "1", "exp": expiracao, "typ": "access", "admin": True, "ativo": True}, SECRET_KEY, ALGORITHM)
+
+
+async def aguardar_servidor(cliente, tempo_limite=30):
+    limite = time.monotonic() + tempo_limite
+    while time.monotonic() < limite:
+        try:
+            await cliente.get("/auth/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("O servidor não respondeu a tempo")
+
+
+async def gerar_carga(cliente, segundos, concorrencia):
+    sucessos, falhas = 0, 0
+    fim = time.monotonic() + segundos
+
+    async def cliente_virtual():
+        nonlocal sucessos, falhas
+        while time.monotonic() < fim:
+            resposta = await cliente.post("/pedidos/pedido", json={"id_usuario": 1})
+            if resposta.status_code != 200:
+                falhas += 1
+                continue
+            sucessos += 1
+            id_pedido = int(resposta.json()["mensagem"].rsplit(" ", 1)[-1])
+            item = {"quantidade": 1, "sabor": "calabresa", "tamanho": "grande", "preco_unitario": 49.9}
+            resposta = await cliente.post(f"/pedidos/pedido/adicionar-item/{id_pedido}", json=item)
+            if resposta.status_code == 200:
+                sucessos += 1
+            else:
+                falhas += 1
+
+    await asyncio.gather(*(cliente_virtual() for _ in range(concorrencia)))
+    return sucessos, falhas
+
+
+async def medir(workers, segundos, concorrencia, porta):
+    with tempfile.TemporaryDirectory() as pasta:
+        preparar_banco(pasta)
+        ambiente = {**os.environ, "PYTHONPATH": RAIZ, "LIMITE_ATIVO": "false"} # Sem limite de requisições durante a medição
+        processo = subprocess.Popen(
+            [sys.executable, os.path.join(RAIZ, "servidor.py"), "--workers", str(workers), "--porta", str(porta), "--host", "127.0.0.1"],
+            cwd=pasta, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            limites = httpx.Limits(max_connections=concorrencia)
+            cabecalhos = {"Authorization": f"Bearer {gerar_token()}"}
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", headers=cabecalhos, limits=limites, timeout=30) as cliente:
+                await aguardar_servidor(cliente)
+                sucessos, falhas = await gerar_carga(cliente, segundos, concorrencia)
+        finally:
+            processo.send_signal(signal.SIGTERM) # Encerramento gracioso
+            processo.wait(timeout=60)
+    print(f"{workers} workers: {sucessos / segundos:8.1f} escritas/s  ({falhas} falhas)")
+
+
+async def rodar(lista_workers, segundos, concorrencia, porta):
+    for workers in lista_workers:
+        await medir(workers, segundos, concorrencia, porta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede a vazão de escrita com diferentes quantidades de workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--segundos", type=int, default=10)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(rodar(args.workers, args.segundos, args.concorrencia, args.porta))
\ No newline at end of file
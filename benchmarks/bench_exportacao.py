@@ -0,0 +1,76 @@
+# ===========================================
+# BENCHMARK: MEMÓRIA DA EXPORTAÇÃO DE PEDIDOS EM STREAMING
+# ===========================================
+# Popula bancos temporários com quantidades crescentes de pedidos e consome a exportação
+# (NDJSON e CSV) medindo o pico de memória com o tracemalloc. O pico deve ficar praticamente
+# igual independentemente do tamanho da tabela.
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_exportacao.py --pedidos 10000 100000 1000000
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from models import Base
+from order_routes import gerar_exportacao_pedidos
+
+
+def popular_banco(caminho, quantidade_pedidos, itens_por_pedido):
+    Base.metadata.create_all(create_engine(f"sqlite:///{caminho}"))
+    conexao = sqlite3.connect(caminho)
+    conexao.execute("INSERT INTO usuarios (id, nome, email, senha, ativo, admin) VALUES (1, 'bench', 'bench@bench.com', 'x', 1, 1)")
+    conexao.executemany(
+        "INSERT INTO pedidos (id, status, usuario, preco) VALUES (?, 'FINALIZADO', 1, ?)",
+        ((id_pedido, 50.0 * itens_por_pedido) for id_pedido in range(1, quantidade_pedidos + 1)),
+    )
+    conexao.executemany(
+        "INSERT INTO itens_pedido (quantidade, sabor, tamanho, preco_unitario, pedido) VALUES (1, 'calabresa', 'grande', 50.0, ?)",
+        (id_pedido for id_pedido in range(1, quantidade_pedidos + 1) for _ in range(itens_por_pedido)),
+    )
+    conexao.commit()
+    conexao.close()
+
+
+async def medir_exportacao(caminho, formato):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{caminho}")
+    fabrica = async_sessionmaker(bind=engine, expire_on_commit=False)
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    total_bytes = 0
+    async for pedaco in gerar_exportacao_pedidos(fabrica, formato):
+        total_bytes += len(pedaco) # Descarta o conteúdo, como faria o envio pela rede
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await engine.dispose()
+    return duracao, pico, total_bytes
+
+
+async def rodar(quantidades, itens_por_pedido):
+    for quantidade in quantidades:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "bench.db")
+            popular_banco(caminho, quantidade, itens_por_pedido)
+            for formato in ("ndjson", "csv"):
+                duracao, pico, total_bytes = await medir_exportacao(caminho, formato)
+                print(
+                    f"{quantidade:>9} pedidos {formato:<6} tempo={duracao:7.2f} s  "
+                    f"saída={total_bytes / 1024 / 1024:8.1f} MiB  pico de memória={pico / 1024 / 1024:6.2f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o pico de memória da exportação de pedidos")
+    parser.add_argument("--pedidos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--itens-por-pedido", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(rodar(args.pedidos, args.itens_por_pedido))
\ No newline at end of file
@@ -0,0 +1,125 @@
+# ===========================================
+# BENCHMARK: ESCRITAS POR SEGUNDO COM E SEM GROUP COMMIT
+# ===========================================
+# Sobe o servidor (servidor.py) numa pasta temporária com um banco novo, primeiro com ESCRITA_EM_LOTE=false
+# (um commit por requisição) e depois com ESCRITA_EM_LOTE=true (fila de escrita com commit em lote).
+# Em cada rodada, clientes concorrentes adicionam itens a pedidos sorteados durante alguns segundos; o
+# resultado mostra as escritas por segundo, a latência (p50 e p99) e se a soma dos preços dos pedidos
+# continua igual à soma dos subtotais dos itens (nenhuma escrita perdida ou duplicada).
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_group_commit.py --segundos 10
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(RAIZ)
+
+import httpx
+from sqlalchemy import create_engine, insert, select, func
+
+from models import Base, Usuario, Pedido, ItemPedido
+from bench_escrita_workers import gerar_token, aguardar_servidor
+
+ITEM = {"quantidade": 2, "sabor": "calabresa", "tamanho": "grande", "preco_unitario": 49.9}
+
+
+def preparar_banco(pasta, quantidade_pedidos):
+    # O servidor usa "sqlite:///banco.db", relativo à pasta em que é iniciado
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, 'banco.db')}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Usuario).values(id=1, nome="bench", email="bench@bench.com", senha="x", ativo=True, admin=True))
+        conexao.execute(insert(Pedido), [{"usuario": 1, "status": "PENDENTE", "preco": 0} for _ in range(quantidade_pedidos)])
+    engine.dispose()
+
+
+def conferir_banco(pasta):
+    # Devolve (soma dos preços dos pedidos, soma dos subtotais dos itens, quantidade de itens)
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, 'banco.db')}")
+    with engine.connect() as conexao:
+        soma_pedidos = conexao.scalar(select(func.coalesce(func.sum(Pedido.preco), 0)))
+        soma_itens, quantidade = conexao.execute(
+            select(func.coalesce(func.sum(ItemPedido.preco_unitario * ItemPedido.quantidade), 0), func.count(ItemPedido.id))
+        ).one()
+    engine.dispose()
+    return soma_pedidos, soma_itens, quantidade
+
+
+def percentil(valores, fracao):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+
+async def gerar_carga(cliente, segundos, concorrencia, quantidade_pedidos):
+    latencias, falhas = [], 0
+    fim = time.monotonic() + segundos
+
+    async def cliente_virtual():
+        nonlocal falhas
+        while time.monotonic() < fim:
+            id_pedido = random.randint(1, quantidade_pedidos)
+            inicio = time.perf_counter()
+            resposta = await cliente.post(f"/pedidos/pedido/adicionar-item/{id_pedido}", json=ITEM)
+            if resposta.status_code == 200:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                falhas += 1
+
+    await asyncio.gather(*(cliente_virtual() for _ in range(concorrencia)))
+    return latencias, falhas
+
+
+async def medir(em_lote, args):
+    with tempfile.TemporaryDirectory() as pasta:
+        preparar_banco(pasta, args.pedidos)
+        ambiente = {
+            **os.environ,
+            "PYTHONPATH": RAIZ,
+            "LIMITE_ATIVO": "false", # Sem limite de requisições durante a medição
+            "ESCRITA_EM_LOTE": "true" if em_lote else "false",
+        }
+        processo = subprocess.Popen(
+            [sys.executable, os.path.join(RAIZ, "servidor.py"), "--workers", str(args.workers), "--porta", str(args.porta), "--host", "127.0.0.1"],
+            cwd=pasta, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            limites = httpx.Limits(max_connections=args.concorrencia)
+            cabecalhos = {"Authorization": f"Bearer {gerar_token()}"}
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.porta}", headers=cabecalhos, limits=limites, timeout=30) as cliente:
+                await aguardar_servidor(cliente)
+                latencias, falhas = await gerar_carga(cliente, args.segundos, args.concorrencia, args.pedidos)
+        finally:
+            processo.send_signal(signal.SIGTERM) # Encerramento gracioso (a fila de escrita é esvaziada)
+            processo.wait(timeout=60)
+        soma_pedidos, soma_itens, quantidade_itens = conferir_banco(pasta)
+
+    nome = "group commit" if em_lote else "commit próprio"
+    print(f"{nome:<15} {len(latencias) / args.segundos:8.1f} escritas/s  p50={percentil(latencias, 0.50) * 1000:7.1f} ms  "
+          f"p99={percentil(latencias, 0.99) * 1000:7.1f} ms  ({falhas} falhas)")
+    consistente = soma_pedidos == soma_itens and quantidade_itens == len(latencias)
+    print(f"{'':<15} pedidos={soma_pedidos}  itens={soma_itens} ({quantidade_itens} itens)  {'OK' if consistente else 'DIVERGENTE'}")
+
+
+async def rodar(args):
+    for em_lote in (False, True):
+        await medir(em_lote, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara a vazão de escrita com e sem group commit")
+    parser.add_argument("--segundos", type=int, default=10)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--pedidos", type=int, default=200, help="Pedidos criados antes da medição")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--porta", type=int, default=8766)
+    args = parser.parse_args()
+    asyncio.run(rodar(args))
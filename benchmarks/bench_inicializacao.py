@@ -0,0 +1,125 @@
+# ===========================================
+# BENCHMARK: TEMPO DE INICIALIZAÇÃO DE UM WORKER
+# ===========================================
+# Mede, em processos Python novos (como um worker recém-criado pelo autoscaling):
+# - o tempo de "import main" segundo o "python -X importtime" e os módulos que mais pesam na importação;
+# - o tempo até o worker estar pronto: importação + lifespan (engines, aquecimento e revogações).
+# Cada medida é repetida e o resultado é a mediana. Com --referencia, mede também outro commit
+# (ex: o anterior à fábrica da aplicação) numa cópia temporária do repositório (git worktree).
+#
+# Para rodar (a partir da raiz do projeto):
+#   python benchmarks/bench_inicializacao.py
+#   python benchmarks/bench_inicializacao.py --referencia HEAD~1 --repeticoes 10
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Executado no processo filho: importa a aplicação e roda a inicialização do lifespan, como o uvicorn faria
+CODIGO_PRONTO = """
+import asyncio, json, time
+inicio = time.perf_counter()
+from main import app
+importado = time.perf_counter()
+async def iniciar():
+    async with app.router.lifespan_context(app):
+        pronto = time.perf_counter()
+        print(json.dumps({"importacao_ms": (importado - inicio) * 1000, "lifespan_ms": (pronto - importado) * 1000, "total_ms": (pronto - inicio) * 1000}))
+asyncio.run(iniciar())
+"""
+
+
+def ambiente_para(raiz, pasta):
+    return {
+        **os.environ,
+        "PYTHONPATH": raiz,
+        "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'inicializacao.db')}",
+        "LIMITE_ATIVO": "false",
+    }
+
+
+def preparar_banco(raiz, pasta):
+    # As tabelas precisam existir: a inicialização carrega as revogações e limpa as chaves de idempotência
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=raiz, env=ambiente_para(raiz, pasta),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def ler_importtime(saida):
+    # Linhas no formato "import time:   self [us] |  cumulative | imported package"
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        modulos.append((nome.rstrip(), int(proprio), int(acumulado)))
+    return modulos
+
+
+def medir_importtime(raiz, pasta):
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=raiz,
+                              env=ambiente_para(raiz, pasta), capture_output=True, text=True, check=True)
+    modulos = ler_importtime(processo.stderr)
+    # Os módulos de primeiro nível (sem recuo) somam o tempo total da importação
+    total_us = sum(acumulado for nome, _, acumulado in modulos if not nome.startswith(" "))
+    return total_us / 1000, modulos
+
+
+def medir_pronto(raiz, pasta):
+    processo = subprocess.run([sys.executable, "-c", CODIGO_PRONTO], cwd=raiz, env=ambiente_para(raiz, pasta),
+                              capture_output=True, text=True, check=True)
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def medir(raiz, repeticoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        preparar_banco(raiz, pasta)
+        medir_pronto(raiz, pasta) # Aquecimento: gera os .pyc e carrega os arquivos no cache do sistema operacional
+        importtime, prontos, modulos = [], [], []
+        for _ in range(repeticoes):
+            total_ms, modulos = medir_importtime(raiz, pasta)
+            importtime.append(total_ms)
+            prontos.append(medir_pronto(raiz, pasta))
+    return {
+        "importtime_ms": statistics.median(importtime),
+        "importacao_ms": statistics.median(pronto["importacao_ms"] for pronto in prontos),
+        "lifespan_ms": statistics.median(pronto["lifespan_ms"] for pronto in prontos),
+        "total_ms": statistics.median(pronto["total_ms"] for pronto in prontos),
+        "modulos": modulos,
+    }
+
+
+def medir_referencia(referencia, repeticoes):
+    pasta = tempfile.mkdtemp()
+    copia = os.path.join(pasta, "referencia")
+    subprocess.run(["git", "worktree", "add", "--detach", copia, referencia], cwd=RAIZ, check=True, stdout=subprocess.DEVNULL)
+    try:
+        return medir(copia, repeticoes)
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", copia], cwd=RAIZ, check=True)
+
+
+def imprimir(nome, resultado):
+    print(f"{nome:<12} importtime={resultado['importtime_ms']:8.1f} ms  import main={resultado['importacao_ms']:8.1f} ms  "
+          f"lifespan={resultado['lifespan_ms']:8.1f} ms  pronto={resultado['total_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização de um worker")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--referencia", help="Commit/branch medido para comparação (ex: HEAD~1)")
+    parser.add_argument("--modulos", type=int, default=15, help="Quantidade de módulos mais lentos listados")
+    args = parser.parse_args()
+
+    atual = medir(RAIZ, args.repeticoes)
+    if args.referencia:
+        imprimir(args.referencia, medir_referencia(args.referencia, args.repeticoes))
+    imprimir("atual", atual)
+
+    print("\nMódulos mais lentos na importação (tempo acumulado, árvore atual):")
+    for nome, proprio, acumulado in sorted(atual["modulos"], key=lambda modulo: modulo[2], reverse=True)[:args.modulos]:
+        print(f"  {acumulado / 1000:8.1f} ms  (próprio {proprio / 1000:6.1f} ms)  {nome.strip()}")
@@ -0,0 +1,57 @@
+# ===========================================
+# MICROBENCHMARK: SERIALIZAÇÃO DAS RESPOSTAS DE PEDIDOS
+# ===========================================
+# Compara o tempo para transformar a resposta de visualizar_pedido em bytes JSON:
+# - antes: objeto do ORM passado pelo jsonable_encoder (reflexão genérica) + JSONResponse (json padrão)
+# - depois: response_model pré-compilado (pydantic-core) + ORJSONResponse
+# para um pedido com 1 item e outro com 500 itens. Não acessa o banco de dados.
+#
+# Para rodar (a partir da raiz do projeto): python benchmarks/bench_serializacao.py
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from models import Pedido, ItemPedido
+from schemas import RespostaVisualizarPedidoSchema
+
+adaptador = TypeAdapter(RespostaVisualizarPedidoSchema)
+
+
+def criar_pedido(quantidade_itens):
+    pedido = Pedido(usuario=1)
+    pedido.id = 1
+    pedido.itens = [ItemPedido(2, "calabresa", "grande", 49.9, 1) for _ in range(quantidade_itens)]
+    pedido.calcular_preco()
+    return pedido
+
+
+def serializar_antes(pedido):
+    conteudo = jsonable_encoder({"quantidade_itens_pedido": len(pedido.itens), "pedido": pedido})
+    return JSONResponse(conteudo).body
+
+
+def serializar_depois(pedido):
+    resposta = adaptador.validate_python({"quantidade_itens_pedido": len(pedido.itens), "pedido": pedido}, from_attributes=True)
+    return ORJSONResponse(adaptador.dump_python(resposta, mode="json")).body
+
+
+def rodar():
+    for quantidade_itens in (1, 500):
+        pedido = criar_pedido(quantidade_itens)
+        repeticoes = 2000 if quantidade_itens == 1 else 50
+        resultados = {}
+        for nome, funcao in (("antes", serializar_antes), ("depois", serializar_depois)):
+            melhor = min(timeit.repeat(lambda: funcao(pedido), number=repeticoes, repeat=5)) / repeticoes
+            resultados[nome] = melhor
+            print(f"{quantidade_itens:>3} itens  {nome:<6} {melhor * 1_000_000:10.1f} µs por resposta")
+        print(f"{quantidade_itens:>3} itens  ganho  {resultados['antes'] / resultados['depois']:10.1f}x")
+
+
+if __name__ == "__main__":
+    rodar()
\ No newline at end of file
@@ -0,0 +1,211 @@
+# ===========================================
+# TESTE DE CARGA REPRODUTÍVEL DA API DE PEDIDOS
+# ===========================================
+# 1. Cria um banco novo (migrações do Alembic) e popula com usuários, pedidos e itens
+# 2. Executa fluxos realistas em paralelo: login, criar pedido, adicionar itens, visualizar,
+#    listar os pedidos do usuário e finalizar
+# 3. Mostra a vazão e as latências p50/p95/p99 de cada passo e salva tudo em JSON
+# 4. Compara com uma baseline salva anteriormente: se algum passo piorar além da tolerância,
+#    o script termina com erro (útil para rodar em CI)
+#
+# Por padrão a aplicação roda no mesmo processo (ASGI, sem rede). Com --url, as requisições vão
+# para um servidor já em execução, que precisa usar o mesmo banco informado em --banco.
+#
+# Exemplos (a partir da raiz do projeto):
+#   python benchmarks/carga.py --salvar-baseline              # gera a baseline
+#   python benchmarks/carga.py                                # compara com a baseline
+#   python benchmarks/carga.py --usuarios 200 --pedidos-por-usuario 50 --concorrencia 64
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BASELINE_PADRAO = os.path.join(RAIZ, "benchmarks", "baseline_carga.json")
+SENHA = "senha-carga"
+
+
+# ===========================================
+# PREPARAÇÃO DO BANCO
+# ===========================================
+def popular_banco(usuarios, pedidos_por_usuario, itens_por_pedido):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import insert
+    from senhas import pegar_bcrypt_context
+    from models import criar_engines, Usuario, Pedido, ItemPedido
+
+    command.upgrade(Config(os.path.join(RAIZ, "alembic.ini")), "head")
+    db, _ = criar_engines()
+    senha_criptografada = pegar_bcrypt_context().hash(SENHA) # Mesmo hash para todos os usuários (popular fica rápido)
+    with db.begin() as conexao:
+        conexao.execute(insert(Usuario), [
+            {"id": id_usuario, "nome": f"carga {id_usuario}", "email": f"carga{id_usuario}@bench.com",
+             "senha": senha_criptografada, "ativo": True, "admin": False}
+            for id_usuario in range(1, usuarios + 1)
+        ])
+        id_pedido = 0
+        for id_usuario in range(1, usuarios + 1):
+            pedidos, itens = [], []
+            for _ in range(pedidos_por_usuario):
+                id_pedido += 1
+                pedidos.append({"id": id_pedido, "status": "FINALIZADO", "usuario": id_usuario, "preco": 49.9 * itens_por_pedido})
+                itens.extend({"quantidade": 1, "sabor": "calabresa", "tamanho": "grande", "preco_unitario": 49.9, "pedido": id_pedido}
+                             for _ in range(itens_por_pedido))
+            if pedidos:
+                conexao.execute(insert(Pedido), pedidos)
+            if itens:
+                conexao.execute(insert(ItemPedido), itens)
+
+
+# ===========================================
+# FLUXO DE UM CLIENTE
+# ===========================================
+async def fluxo(cliente, id_usuario, itens_por_fluxo, latencias, erros):
+    async def chamar(passo, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        resposta = await cliente.request(metodo, url, **kwargs)
+        latencias.setdefault(passo, []).append((time.perf_counter() - inicio) * 1000)
+        if resposta.status_code != 200:
+            erros[passo] = erros.get(passo, 0) + 1
+            return None
+        return resposta.json()
+
+    tokens = await chamar("login", "POST", "/auth/login", json={"email": f"carga{id_usuario}@bench.com", "senha": SENHA})
+    if not tokens:
+        return
+    cabecalhos = {"Authorization": f"Bearer {tokens['access_token']}"}
+    criado = await chamar("criar_pedido", "POST", "/pedidos/pedido", json={"id_usuario": id_usuario}, headers=cabecalhos)
+    if not criado:
+        return
+    id_pedido = int(criado["mensagem"].rsplit(" ", 1)[-1])
+    item = {"quantidade": 2, "sabor": "calabresa", "tamanho": "grande", "preco_unitario": 49.9}
+    for _ in range(itens_por_fluxo):
+        await chamar("adicionar_item_pedido", "POST", f"/pedidos/pedido/adicionar-item/{id_pedido}", json=item, headers=cabecalhos)
+    await chamar("visualizar_pedido", "GET", f"/pedidos/pedido/{id_pedido}", headers=cabecalhos)
+    await chamar("listar", "GET", "/pedidos/listar/pedidos-usuario", headers=cabecalhos)
+    await chamar("finalizar_pedido", "POST", f"/pedidos/pedido/finalizar/{id_pedido}", headers=cabecalhos)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, int(round(p / 100 * len(ordenados))) - 1)]
+
+
+async def executar_carga(args):
+    import httpx
+    if args.url:
+        cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        ciclo_de_vida = contextlib.nullcontext()
+    else:
+        from main import app
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://carga", timeout=60)
+        ciclo_de_vida = app.router.lifespan_context(app) # O ASGITransport não executa o lifespan (engines e aquecimento)
+
+    sorteio = random.Random(args.semente) # Mesma sequência de usuários a cada execução
+    fila = asyncio.Queue()
+    for _ in range(args.fluxos):
+        fila.put_nowait(sorteio.randint(1, args.usuarios))
+    latencias, erros = {}, {}
+
+    async def cliente_virtual():
+        while not fila.empty():
+            await fluxo(cliente, fila.get_nowait(), args.itens_por_fluxo, latencias, erros)
+
+    async with ciclo_de_vida, cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_virtual() for _ in range(args.concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    passos = {
+        passo: {
+            "requisicoes": len(valores),
+            "erros": erros.get(passo, 0),
+            "vazao_rps": len(valores) / duracao,
+            "p50_ms": statistics.median(valores),
+            "p95_ms": percentil(valores, 95),
+            "p99_ms": percentil(valores, 99),
+        }
+        for passo, valores in latencias.items()
+    }
+    total = sum(len(valores) for valores in latencias.values())
+    return {"duracao_s": duracao, "vazao_total_rps": total / duracao, "passos": passos}
+
+
+# ===========================================
+# RELATÓRIO E COMPARAÇÃO COM A BASELINE
+# ===========================================
+def comparar(resultado, baseline, tolerancia):
+    regressoes = []
+    for passo, atual in resultado["passos"].items():
+        anterior = baseline["passos"].get(passo)
+        if not anterior:
+            continue
+        if atual["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{passo}: p95 {anterior['p95_ms']:.1f} ms -> {atual['p95_ms']:.1f} ms")
+        if atual["vazao_rps"] < anterior["vazao_rps"] * (1 - tolerancia):
+            regressoes.append(f"{passo}: vazão {anterior['vazao_rps']:.1f} -> {atual['vazao_rps']:.1f} req/s")
+        if atual["erros"] > anterior["erros"]:
+            regressoes.append(f"{passo}: erros {anterior['erros']} -> {atual['erros']}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga reprodutível da API de pedidos")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--pedidos-por-usuario", type=int, default=20)
+    parser.add_argument("--itens-por-pedido", type=int, default=3)
+    parser.add_argument("--fluxos", type=int, default=200, help="Quantidade de fluxos completos executados")
+    parser.add_argument("--itens-por-fluxo", type=int, default=3)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--banco", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--url", help="URL de um servidor em execução (padrão: aplicação no mesmo processo)")
+    parser.add_argument("--saida", default=os.path.join(RAIZ, "benchmarks", "resultado_carga.json"))
+    parser.add_argument("--baseline", default=BASELINE_PADRAO)
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como nova baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora relativa aceita antes de falhar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # A URL precisa estar no ambiente antes de importar a aplicação (models.py lê DATABASE_URL na importação)
+        os.environ["DATABASE_URL"] = args.banco or f"sqlite:///{os.path.join(pasta, 'carga.db')}"
+        os.environ.pop("DATABASE_URL_ASYNC", None)
+        os.environ["LIMITE_ATIVO"] = "false" # O limite de requisições recusaria a carga gerada pelo próprio teste
+        sys.path.append(RAIZ)
+        popular_banco(args.usuarios, args.pedidos_por_usuario, args.itens_por_pedido)
+        resultado = asyncio.run(executar_carga(args))
+
+    resultado["parametros"] = {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "baseline", "salvar_baseline")}
+    resultado["ambiente"] = {"python": platform.python_version(), "plataforma": platform.platform()}
+
+    print(f"{'passo':<24}{'req':>7}{'erros':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for passo, dados in resultado["passos"].items():
+        print(f"{passo:<24}{dados['requisicoes']:>7}{dados['erros']:>7}{dados['vazao_rps']:>10.1f}"
+              f"{dados['p50_ms']:>10.2f}{dados['p95_ms']:>10.2f}{dados['p99_ms']:>10.2f}")
+    print(f"Vazão total: {resultado['vazao_total_rps']:.1f} req/s em {resultado['duracao_s']:.1f} s")
+
+    with open(args.saida, "w") as arquivo:
+        json.dump(resultado, arquivo, indent=2)
+    if args.salvar_baseline:
+        with open(args.baseline, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+        print(f"Baseline salva em {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressoes = comparar(resultado, json.load(open(args.baseline)), args.tolerancia)
+        if regressoes:
+            raise SystemExit("Regressões de desempenho:\n" + "\n".join(regressoes))
+        print("OK: nenhuma regressão em relação à baseline")
+    else:
+        print(f"Sem baseline em {args.baseline} (use --salvar-baseline para criar)")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
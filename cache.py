@@ -0,0 +1,53 @@
+from collections import OrderedDict # Dicionário que mantém a ordem de uso, base do LRU
+import time
+
+# ===========================================
+# CACHE EM MEMÓRIA COM EXPIRAÇÃO (TTL) E LIMITE DE TAMANHO (LRU)
+# ===========================================
+class CacheTTL:
+    def __init__(self, tamanho_maximo, ttl_segundos):
+        self.tamanho_maximo = tamanho_maximo # Quantidade máxima de entradas (as menos usadas saem primeiro)
+        self.ttl_segundos = ttl_segundos # Tempo de vida padrão de cada entrada
+        self.entradas = OrderedDict() # chave -> (expira_em, valor)
+        self.hits = 0
+        self.misses = 0
+
+    # Retorna o valor guardado ou None se não existir ou já tiver expirado
+    def obter(self, chave):
+        entrada = self.entradas.get(chave)
+        if entrada is None:
+            self.misses += 1
+            return None
+        expira_em, valor = entrada
+        if expira_em <= time.monotonic():
+            del self.entradas[chave]
+            self.misses += 1
+            return None
+        self.entradas.move_to_end(chave) # Marca como usada recentemente
+        self.hits += 1
+        return valor
+
+    # Guarda um valor; ttl_segundos permite uma expiração diferente da padrão para essa entrada
+    def definir(self, chave, valor, ttl_segundos=None):
+        ttl = self.ttl_segundos if ttl_segundos is None else ttl_segundos
+        self.entradas[chave] = (time.monotonic() + ttl, valor)
+        self.entradas.move_to_end(chave)
+        while len(self.entradas) > self.tamanho_maximo:
+            self.entradas.popitem(last=False) # Remove a entrada usada há mais tempo
+
+    # Remove uma entrada (usado quando o dado de origem muda)
+    def invalidar(self, chave):
+        self.entradas.pop(chave, None)
+
+    def limpar(self):
+        self.entradas.clear()
+
+    # Resumo para acompanhar a eficiência do cache
+    def estatisticas(self):
+        consultas = self.hits + self.misses
+        return {
+            "entradas": len(self.entradas),
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": self.hits / consultas if consultas else 0.0,
+        }
\ No newline at end of file
@@ -0,0 +1,24 @@
+from dotenv import load_dotenv # Importa o dotenv para carregar variáveis de ambiente de um arquivo .env
+import os # Importa a biblioteca os para acessar variáveis de ambiente do sistema
+
+# ===========================================
+# CONFIGURAÇÕES DA APLICAÇÃO
+# ===========================================
+# Módulo sem dependências internas: qualquer outro módulo pode importá-lo sem criar importações circulares
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Lê as variáveis de ambiente necessárias para autenticação
+SECRET_KEY = os.getenv("SECRET_KEY") # Chave secreta usada para gerar e verificar tokens JWT
+ALGORITHM = os.getenv("ALGORITHM") # Algoritmo usado para criptografia dos tokens (ex: HS256)
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")) # Tempo de expiração do token em minutos
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7")) # Tempo de expiração do refresh token em dias
+AUTH_CACHE_TTL_SEGUNDOS = int(os.getenv("AUTH_CACHE_TTL_SEGUNDOS", "60")) # Tempo que um usuário autenticado fica em cache
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "10000")) # Quantidade máxima de usuários em cache
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() == "true" # Confia nas claims do token e não consulta o banco
+JWT_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "10000")) # Quantidade máxima de tokens já verificados mantidos em cache
+
+# Aquecimento feito na inicialização de cada worker, antes de aceitar requisições
+AQUECER_BCRYPT = os.getenv("AQUECER_BCRYPT", "true").lower() == "true" # Carrega o backend do bcrypt com um hash de teste
+AQUECER_CONEXOES = int(os.getenv("AQUECER_CONEXOES", "2")) # Conexões do pool abertas antecipadamente (0 desliga)
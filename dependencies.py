@@ -1,40 +1,200 @@
 from fastapi import Depends, HTTPException
-from main import SECRET_KEY, ALGORITHM, oauth2_schema # Variáveis e esquema de autenticação definidos em main.py
-from models import db
-from sqlalchemy.orm import sessionmaker, Session
+from fastapi.security import OAuth2PasswordBearer # Importa o esquema OAuth2 para autenticação com tokens (Bearer Token)
+from functools import wraps
+import asyncio
+import hashlib
+import os
+import random
+import time
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, AUTH_CACHE_TTL_SEGUNDOS, AUTH_CACHE_MAX, AUTH_STATELESS, JWT_CACHE_MAX # Variáveis de autenticação definidas em config.py
+from models import criar_engines
+from cache import CacheTTL
+from revogacao import esta_revogado
+from metricas import duracao_jwt, registrar_coletor, coletor_cache, instrumentar_engines
+from sqlalchemy import select, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from models import Usuario
 from jose import jwt, JWTError # Biblioteca para codificar e decodificar tokens JWT
 
+# Define o esquema de autenticação usando OAuth2, onde o token será enviado no header da requisição
+oauth2_schema = OAuth2PasswordBearer(tokenUrl="auth/login-form") # URL onde será feito o login para obter o token
+
+# Fábrica de sessões síncronas criada uma única vez para todo o processo
+SessionLocal = sessionmaker()
+
+# Fábrica de sessões assíncronas
+# (expire_on_commit=False evita recarregar os objetos depois do commit, o que exigiria I/O fora do await)
+SessionAsync = async_sessionmaker(expire_on_commit=False)
+
+# ================================
+# Inicialização do banco (chamada no lifespan da aplicação ou pelos scripts antes de usar as sessões)
+# ================================
+banco_iniciado = False
+
+def iniciar_banco():
+    # Cria os engines, liga as fábricas de sessões a eles e registra as métricas de SQL; pode ser chamada mais de uma vez
+    global banco_iniciado
+    db, db_async = criar_engines()
+    if not banco_iniciado:
+        SessionLocal.configure(bind=db)
+        SessionAsync.configure(bind=db_async)
+        instrumentar_engines(db, db_async.sync_engine)
+        banco_iniciado = True
+    return db, db_async
+
 # ================================
 # Dependência para obter uma sessão com o banco de dados
 # ================================
 def pegar_sessao():
+    session = SessionLocal() # Cria a sessão a partir da fábrica compartilhada
     try:
-        # Cria uma fábrica de sessões SQLAlchemy vinculada ao banco
-        Session = sessionmaker(bind=db)
-        session = Session() # Cria a sessão
         yield session # Retorna a sessão para uso (com 'yield', ela é usada como uma dependência injetável)
     finally:
         session.close() # Garante que a sessão será fechada após o uso
 
 
 # ================================
-# Dependência para verificar o token JWT de autenticação
+# Dependência para obter uma sessão assíncrona com o banco de dados
 # ================================
-def verificar_token(
-        token: str = Depends(oauth2_schema), # Obtém o token automaticamente do header Authorization
-        session: Session = Depends(pegar_sessao) # Usa a sessão do banco via dependência
-    ):
-    try:
-        # Decodifica o token usando a chave secreta e o algoritmo definidos
-        dic_info = jwt.decode(token, SECRET_KEY, ALGORITHM)
-        id_usuario = int(dic_info.get("sub")) # Extrai o ID do usuário (sub = subject)
-    except JWTError:
-        # Caso o token esteja inválido ou expirado
-        raise HTTPException(status_code=401, detail="Acesso Negado, verifique a válidade do token")
+async def pegar_sessao_async():
+    # O 'async with' garante que a sessão será fechada após o uso, sem bloquear o event loop
+    async with SessionAsync() as session:
+        yield session
+
+
+# ================================
+# Usuário autenticado (apenas os dados usados nas rotas protegidas)
+# ================================
+class UsuarioAutenticado:
+    __slots__ = ("id", "admin", "ativo")
+
+    def __init__(self, id, admin, ativo):
+        self.id = id
+        self.admin = bool(admin)
+        self.ativo = bool(ativo)
+
+
+# Cache dos usuários autenticados, indexado pelo ID do usuário
+cache_usuarios = CacheTTL(tamanho_maximo=AUTH_CACHE_MAX, ttl_segundos=AUTH_CACHE_TTL_SEGUNDOS)
+
+def invalidar_usuario(id_usuario):
+    # Deve ser chamada sempre que os dados de um usuário mudarem
+    cache_usuarios.invalidar(id_usuario)
+
+# Expõe os acertos e erros do cache no /metrics
+registrar_coletor(coletor_cache("cache_usuarios", cache_usuarios))
+
+# Qualquer alteração ou remoção de um usuário via ORM invalida a entrada correspondente no cache
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def invalidar_usuario_alterado(mapper, connection, usuario):
+    invalidar_usuario(usuario.id)
+
+
+# ================================
+# Repetição de escritas quando o SQLite está bloqueado por outro processo
+# ================================
+# Com vários workers, só um processo escreve no SQLite por vez. O busy_timeout faz o SQLite esperar pelo lock,
+# mas uma transação que começou lendo e depois tenta escrever recebe "database is locked" na hora.
+# Nesse caso a rota inteira é desfeita e executada de novo, com espera exponencial e aleatória entre as tentativas.
+SQLITE_TENTATIVAS_ESCRITA = int(os.getenv("SQLITE_TENTATIVAS_ESCRITA", "5"))
+SQLITE_ESPERA_BASE_MS = float(os.getenv("SQLITE_ESPERA_BASE_MS", "20"))
+
+def banco_bloqueado(erro):
+    return "database is locked" in str(erro) or "database is busy" in str(erro)
+
+def repetir_se_bloqueado(rota):
+    # Deve ser aplicado abaixo do decorador do roteador; a rota precisa receber a sessão no parâmetro "session"
+    @wraps(rota)
+    async def executar(*args, **kwargs):
+        for tentativa in range(1, SQLITE_TENTATIVAS_ESCRITA + 1):
+            try:
+                return await rota(*args, **kwargs)
+            except OperationalError as erro:
+                if not banco_bloqueado(erro):
+                    raise
+                await kwargs["session"].rollback()
+                if tentativa == SQLITE_TENTATIVAS_ESCRITA:
+                    raise HTTPException(status_code=503, detail="Banco de dados ocupado, tente novamente", headers={"Retry-After": "1"})
+                espera_ms = SQLITE_ESPERA_BASE_MS * 2 ** (tentativa - 1)
+                await asyncio.sleep(random.uniform(0, espera_ms) / 1000)
+    return executar
+
+
+# ================================
+# Decodificação dos tokens JWT com cache dos tokens já verificados
+# ================================
+# O mesmo access token é apresentado centenas de vezes durante a sua validade. A chave do cache é um
+# digest do token inteiro, então só um token idêntico (byte a byte) a um já verificado pula a checagem
+# da assinatura; cada entrada expira junto com o "exp" do próprio token.
+cache_tokens = CacheTTL(tamanho_maximo=JWT_CACHE_MAX, ttl_segundos=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decodificar_token(token, tipo_esperado, checar_revogacao=True):
+    chave = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    dic_info = cache_tokens.obter(chave)
+    if dic_info is None:
+        inicio = time.perf_counter()
+        try:
+            # Decodifica o token usando a chave secreta e o algoritmo definidos (valida assinatura e expiração)
+            dic_info = jwt.decode(token, SECRET_KEY, ALGORITHM)
+        except JWTError:
+            # Caso o token esteja inválido ou expirado
+            raise HTTPException(status_code=401, detail="Acesso Negado, verifique a válidade do token")
+        finally:
+            duracao_jwt.observar(time.perf_counter() - inicio)
+        validade_restante = dic_info["exp"] - time.time()
+        if validade_restante > 0:
+            cache_tokens.definir(chave, dic_info, ttl_segundos=validade_restante)
+    # Um refresh token não pode ser usado como access token (e vice-versa)
+    if dic_info.get("typ") != tipo_esperado:
+        raise HTTPException(status_code=401, detail="Acesso Negado, tipo de token inválido")
+    # Tokens revogados (logout, rotação do refresh token ou família comprometida)
+    if checar_revogacao and esta_revogado(dic_info):
+        raise HTTPException(status_code=401, detail="Acesso Negado, token revogado")
+    return dic_info
+
+
+async def carregar_usuario(dic_info, session):
+    id_usuario = int(dic_info.get("sub")) # Extrai o ID do usuário (sub = subject)
+    # No modo stateless, confia nas claims assinadas pelo criar_token e não acessa o banco
+    # (alterações no usuário só passam a valer quando um novo token for emitido)
+    if AUTH_STATELESS and "admin" in dic_info and "ativo" in dic_info:
+        return UsuarioAutenticado(id_usuario, dic_info["admin"], dic_info["ativo"])
+    usuario_autenticado = cache_usuarios.obter(id_usuario)
+    if usuario_autenticado:
+        return usuario_autenticado
     # Busca o usuário no banco pelo ID extraído do token
-    usuario = session.query(Usuario).filter(Usuario.id == id_usuario).first()
+    usuario = await session.scalar(select(Usuario).where(Usuario.id == id_usuario))
     if not usuario:
         # Caso o usuário não exista no banco
         raise HTTPException(status_code=401, detail="Acesso Inválido")
-    return usuario # Retorna o objeto usuário para uso nos endpoints protegidos
\ No newline at end of file
+    usuario_autenticado = UsuarioAutenticado(usuario.id, usuario.admin, usuario.ativo)
+    cache_usuarios.definir(id_usuario, usuario_autenticado)
+    return usuario_autenticado
+
+
+# ================================
+# Usuário do header Authorization, para os middlewares ASGI (antes de qualquer dependência)
+# ================================
+def identificar_usuario(scope):
+    # Retorna o "sub" de um access token válido ou None; não acessa o banco
+    for nome, valor in scope["headers"]:
+        if nome == b"authorization" and valor[:7].lower() == b"bearer ":
+            try:
+                return decodificar_token(valor[7:].decode(), "access")["sub"]
+            except HTTPException:
+                return None
+    return None
+
+
+# ================================
+# Dependência para verificar o token JWT de autenticação
+# ================================
+async def verificar_token(
+        token: str = Depends(oauth2_schema), # Obtém o token automaticamente do header Authorization
+        session: AsyncSession = Depends(pegar_sessao_async) # Usa a sessão assíncrona do banco via dependência
+    ):
+    dic_info = decodificar_token(token, "access")
+    return await carregar_usuario(dic_info, session) # Retorna o usuário autenticado para uso nos endpoints protegidos
\ No newline at end of file
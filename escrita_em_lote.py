@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+from fastapi import HTTPException
+from metricas import operacoes_por_lote
+
+# ===========================================
+# CONFIGURAÇÃO (pode ser ajustada no arquivo .env)
+# ===========================================
+ESCRITA_EM_LOTE = os.getenv("ESCRITA_EM_LOTE", "false").lower() == "true" # Liga o group commit nas rotas de alteração de pedidos
+ESCRITA_LOTE_MAX = int(os.getenv("ESCRITA_LOTE_MAX", "64")) # Operações gravadas no mesmo commit
+ESCRITA_LOTE_ESPERA_MS = float(os.getenv("ESCRITA_LOTE_ESPERA_MS", "2")) # Espera por mais operações antes de gravar um lote
+ESCRITA_FILA_MAX = int(os.getenv("ESCRITA_FILA_MAX", "10000")) # Operações aguardando na fila (acima disso, 503)
+
+logger = logging.getLogger(__name__)
+
+
+def resolver(futuro, resultado=None, erro=None):
+    # A requisição pode ter sido cancelada enquanto esperava (cliente desconectou)
+    if futuro.done():
+        return
+    if erro is not None:
+        futuro.set_exception(erro)
+    else:
+        futuro.set_result(resultado)
+
+
+# ===========================================
+# FILA DE ESCRITA COM GROUP COMMIT
+# ===========================================
+# Cada requisição envia uma operação (uma função que recebe a sessão, faz as leituras, validações e escritas
+# sem commit e devolve o resultado). Uma única tarefa de fundo junta as operações que chegam em poucos
+# milissegundos e executa todas na mesma transação, com um único commit (um único fsync). Cada requisição só
+# recebe o seu resultado depois do commit do seu lote.
+#
+# Regra para as operações: qualquer HTTPException (pedido não encontrado, sem permissão...) deve ser lançada
+# antes da primeira escrita. Assim uma operação recusada não deixa nada na transação do lote.
+class FilaEscrita:
+    def __init__(self):
+        self.fila = None
+        self.tarefa = None
+
+    @property
+    def ativa(self):
+        return self.tarefa is not None
+
+    def iniciar(self, fabrica_sessao):
+        # Chamado no lifespan de cada worker
+        self.fila = asyncio.Queue(maxsize=ESCRITA_FILA_MAX)
+        self.tarefa = asyncio.create_task(self.escrever(fabrica_sessao))
+
+    async def encerrar(self):
+        # Para de aceitar operações e grava as que já estão na fila antes de encerrar o worker
+        tarefa, self.tarefa = self.tarefa, None
+        if tarefa is None:
+            return
+        await self.fila.join()
+        tarefa.cancel()
+
+    async def enviar(self, operacao):
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self.fila.put_nowait((operacao, futuro))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes", headers={"Retry-After": "1"})
+        return await futuro
+
+    async def escrever(self, fabrica_sessao):
+        while True:
+            lote = [await self.fila.get()]
+            if self.fila.qsize() < ESCRITA_LOTE_MAX - 1:
+                # Dá alguns milissegundos para as requisições concorrentes entrarem no mesmo lote
+                await asyncio.sleep(ESCRITA_LOTE_ESPERA_MS / 1000)
+            while len(lote) < ESCRITA_LOTE_MAX and not self.fila.empty():
+                lote.append(self.fila.get_nowait())
+            try:
+                await self.gravar_lote(fabrica_sessao, lote)
+            except Exception as erro:
+                # Não deveria acontecer (os erros são repassados às requisições), mas a tarefa não pode morrer
+                logger.exception("Falha inesperada ao gravar um lote de escritas")
+                for _, futuro in lote:
+                    resolver(futuro, erro=erro)
+            finally:
+                for _ in lote:
+                    self.fila.task_done()
+
+    async def gravar_lote(self, fabrica_sessao, lote):
+        operacoes_por_lote.observar(len(lote))
+        resultados = []
+        try:
+            async with fabrica_sessao() as session:
+                for operacao, futuro in lote:
+                    if futuro.done():
+                        continue # Requisição cancelada antes da sua vez: nada é gravado
+                    try:
+                        resultados.append((futuro, await operacao(session)))
+                    except HTTPException as erro:
+                        resolver(futuro, erro=erro) # Recusada antes de escrever: o resto do lote segue
+                await session.commit()
+        except Exception:
+            # Um erro do banco desfaz o lote inteiro: cada operação é executada de novo sozinha, para que
+            # só a que falhou receba o erro (ex: "database is locked", tratado pelo repetir_se_bloqueado da rota)
+            logger.warning("Lote de %d escritas desfeito, gravando as operações uma a uma", len(lote), exc_info=True)
+            for operacao, futuro in lote:
+                if not futuro.done():
+                    await self.gravar_sozinha(fabrica_sessao, operacao, futuro)
+            return
+        for futuro, resultado in resultados:
+            resolver(futuro, resultado)
+
+    async def gravar_sozinha(self, fabrica_sessao, operacao, futuro):
+        try:
+            async with fabrica_sessao() as session:
+                resultado = await operacao(session)
+                await session.commit()
+        except Exception as erro:
+            resolver(futuro, erro=erro)
+        else:
+            resolver(futuro, resultado)
+
+
+fila_escrita = FilaEscrita()
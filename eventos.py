@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+from sqlalchemy import select, or_
+from models import Pedido
+from metricas import registrar_coletor
+
+# Configurações dos eventos de pedidos (podem ser ajustadas no arquivo .env)
+EVENTOS_HEARTBEAT_SEGUNDOS = float(os.getenv("EVENTOS_HEARTBEAT_SEGUNDOS", "15")) # Comentário enviado em conexões sem eventos (mantém proxies abertos)
+EVENTOS_CONEXOES_MAX = int(os.getenv("EVENTOS_CONEXOES_MAX", "10000")) # Streams abertos ao mesmo tempo em cada worker
+EVENTOS_PENDENTES_MAX = int(os.getenv("EVENTOS_PENDENTES_MAX", "1000")) # Pedidos diferentes aguardando envio para um cliente lento
+EVENTOS_SINCRONIA_SEGUNDOS = float(os.getenv("EVENTOS_SINCRONIA_SEGUNDOS", "2")) # Intervalo da busca por alterações feitas em outros workers
+
+# Um pedido nesses status não muda mais: o stream de um único pedido é encerrado depois de enviá-lo
+STATUS_FINAIS = ("FINALIZADO", "CANCELADO")
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================
+# ASSINATURAS (UMA POR CONEXÃO SSE)
+# ===========================================
+class Assinatura:
+    # Uma conexão parada custa só esse objeto e uma corrotina esperando o sinal (nenhuma fila, thread ou conexão com o banco)
+    __slots__ = ("pendentes", "sinal", "atrasada")
+
+    def __init__(self):
+        self.pendentes = {} # id do pedido -> evento mais recente ainda não enviado
+        self.sinal = asyncio.Event()
+        self.atrasada = False
+
+    def entregar(self, evento):
+        # Quem publica nunca espera pelo cliente: eventos do mesmo pedido se sobrepõem (só o estado mais
+        # recente importa) e, se o cliente acumular pedidos demais sem ler, a conexão é encerrada
+        # para que ele reconecte e busque o estado atual
+        if evento["id"] not in self.pendentes and len(self.pendentes) >= EVENTOS_PENDENTES_MAX:
+            self.atrasada = True
+        else:
+            self.pendentes[evento["id"]] = evento
+        self.sinal.set()
+
+
+# Assinaturas por pedido e por usuário: id -> conjunto de assinaturas
+assinaturas_pedido = {}
+assinaturas_usuario = {}
+
+# Último estado (status, preço) conhecido neste worker de cada pedido acompanhado
+estados_conhecidos = {}
+
+# id do usuário -> maior ID de pedido existente quando o primeiro stream do usuário foi aberto. Na sincronização,
+# um pedido desse usuário com ID maior e nunca visto foi criado em outro worker e é publicado como novo.
+marcas_usuario = {}
+
+conexoes_abertas = 0
+
+
+def coletar_eventos():
+    return [
+        "# TYPE eventos_conexoes_abertas gauge",
+        f"eventos_conexoes_abertas {conexoes_abertas}",
+    ]
+
+registrar_coletor(coletar_eventos)
+
+
+def assinar(destino, chave, ultimo_id_pedido=None):
+    global conexoes_abertas
+    conexoes_abertas += 1
+    assinatura = Assinatura()
+    destino.setdefault(chave, set()).add(assinatura)
+    if ultimo_id_pedido is not None and destino is assinaturas_usuario:
+        marcas_usuario.setdefault(chave, ultimo_id_pedido) # Vale a marca do stream mais antigo ainda aberto
+    return assinatura
+
+
+def cancelar_assinatura(destino, chave, assinatura):
+    global conexoes_abertas
+    conexoes_abertas -= 1
+    assinaturas = destino.get(chave)
+    if assinaturas is not None:
+        assinaturas.discard(assinatura)
+        if not assinaturas:
+            del destino[chave]
+            if destino is assinaturas_usuario:
+                marcas_usuario.pop(chave, None)
+
+
+# ===========================================
+# PUBLICAÇÃO
+# ===========================================
+def criar_evento(id_pedido, id_usuario, status, preco):
+    return {"id": id_pedido, "usuario": id_usuario, "status": status, "preco": float(preco)}
+
+
+def publicar(evento):
+    if evento["id"] in assinaturas_pedido or evento["usuario"] in assinaturas_usuario:
+        estados_conhecidos[evento["id"]] = (evento["status"], evento["preco"])
+    for assinatura in assinaturas_pedido.get(evento["id"], ()):
+        assinatura.entregar(evento)
+    for assinatura in assinaturas_usuario.get(evento["usuario"], ()):
+        assinatura.entregar(evento)
+
+
+def publicar_pedido(pedido):
+    # Chamado pelas rotas depois do commit; não faz I/O
+    publicar(criar_evento(pedido.id, pedido.usuario, pedido.status, pedido.preco))
+
+
+# ===========================================
+# STREAM SSE
+# ===========================================
+def formatar_evento(evento):
+    return f"event: pedido\ndata: {json.dumps(evento)}\n\n"
+
+
+async def gerar_eventos(destino, chave, evento_inicial=None, encerrar_em_status_final=False, ultimo_id_pedido=None):
+    assinatura = assinar(destino, chave, ultimo_id_pedido)
+    if evento_inicial is not None:
+        # O estado enviado na abertura passa a ser o conhecido: se outro worker alterar o pedido antes da próxima
+        # sincronização, a diferença é percebida e publicada (sem isso, a alteração seria tomada como estado inicial)
+        estados_conhecidos[evento_inicial["id"]] = (evento_inicial["status"], evento_inicial["preco"])
+    try:
+        # Pede ao navegador (EventSource) para reconectar em 3 segundos se a conexão cair
+        yield "retry: 3000\n\n"
+        if evento_inicial is not None:
+            yield formatar_evento(evento_inicial)
+            if encerrar_em_status_final and evento_inicial["status"] in STATUS_FINAIS:
+                return
+        while True:
+            try:
+                await asyncio.wait_for(assinatura.sinal.wait(), EVENTOS_HEARTBEAT_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            assinatura.sinal.clear()
+            if assinatura.atrasada:
+                return
+            eventos, assinatura.pendentes = list(assinatura.pendentes.values()), {}
+            # Cada yield só continua quando o cliente consome os dados (controle de fluxo do servidor ASGI);
+            # enquanto isso os novos eventos se acumulam, já agrupados, em assinatura.pendentes
+            for evento in eventos:
+                yield formatar_evento(evento)
+            if encerrar_em_status_final and eventos[-1]["status"] in STATUS_FINAIS:
+                return
+    finally:
+        cancelar_assinatura(destino, chave, assinatura)
+
+
+# ===========================================
+# SINCRONIZAÇÃO ENTRE WORKERS
+# ===========================================
+# Cada worker tem as suas assinaturas; alterações feitas em outro worker são percebidas por uma única
+# consulta periódica (só das colunas id, usuario, status e preco dos pedidos acompanhados), feita apenas
+# enquanto existir alguma conexão aberta neste worker.
+async def sincronizar_eventos(session):
+    ids_pedidos = list(assinaturas_pedido)
+    ids_usuarios = list(assinaturas_usuario)
+    if not ids_pedidos and not ids_usuarios:
+        estados_conhecidos.clear()
+        return
+    filtros = []
+    if ids_pedidos:
+        filtros.append(Pedido.id.in_(ids_pedidos))
+    if ids_usuarios:
+        filtros.append(Pedido.usuario.in_(ids_usuarios))
+    linhas = (await session.execute(select(Pedido.id, Pedido.usuario, Pedido.status, Pedido.preco).where(or_(*filtros)))).all()
+    acompanhados = set()
+    for id_pedido, id_usuario, status, preco in linhas:
+        acompanhados.add(id_pedido)
+        evento = criar_evento(id_pedido, id_usuario, status, preco)
+        anterior = estados_conhecidos.get(id_pedido)
+        if anterior is None:
+            # Primeira vez visto: pedido que já existia quando o stream do usuário foi aberto (só é registrado)
+            # ou pedido criado em outro worker depois disso (publicado como novo)
+            estados_conhecidos[id_pedido] = (status, evento["preco"])
+            marca = marcas_usuario.get(id_usuario)
+            if marca is not None and id_pedido > marca:
+                publicar(evento)
+        elif anterior != (status, evento["preco"]):
+            publicar(evento)
+    # Esquece os pedidos que ninguém mais acompanha
+    for id_pedido in [id_pedido for id_pedido in estados_conhecidos if id_pedido not in acompanhados]:
+        del estados_conhecidos[id_pedido]
+
+
+async def manter_eventos_sincronizados(fabrica_sessao):
+    # Tarefa de fundo iniciada junto com a aplicação
+    while True:
+        await asyncio.sleep(EVENTOS_SINCRONIA_SEGUNDOS)
+        if not assinaturas_pedido and not assinaturas_usuario and not estados_conhecidos:
+            continue
+        try:
+            async with fabrica_sessao() as session:
+                await sincronizar_eventos(session)
+        except Exception:
+            logger.exception("Falha ao sincronizar os eventos de pedidos")
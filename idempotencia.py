@@ -0,0 +1,151 @@
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from cache import CacheTTL
+from dependencies import SessionAsync, identificar_usuario
+from models import ChaveIdempotencia
+import hashlib
+import os
+import time
+
+# Configurações das chaves de idempotência (podem ser ajustadas no arquivo .env)
+IDEMPOTENCIA_TTL_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400")) # Tempo em que uma repetição devolve a resposta salva
+IDEMPOTENCIA_RESERVA_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_RESERVA_SEGUNDOS", "60")) # Validade da reserva enquanto a rota executa
+IDEMPOTENCIA_CACHE_MAX = int(os.getenv("IDEMPOTENCIA_CACHE_MAX", "10000")) # Respostas mantidas em memória
+
+# Rotas protegidas pelo header Idempotency-Key: todos os POST de /pedidos
+PREFIXO_ROTAS = "/pedidos/"
+
+# Respostas recentes em memória: chave -> (hash do corpo da requisição, status, content-type, corpo)
+cache_respostas = CacheTTL(tamanho_maximo=IDEMPOTENCIA_CACHE_MAX, ttl_segundos=IDEMPOTENCIA_TTL_SEGUNDOS)
+
+
+async def responder(send, status_code, tipo_conteudo, corpo, repeticao=False):
+    cabecalhos = [(b"content-type", tipo_conteudo.encode()), (b"content-length", str(len(corpo)).encode())]
+    if repeticao:
+        cabecalhos.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": status_code, "headers": cabecalhos})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def responder_erro(send, status_code, detalhe):
+    corpo = ('{"detail":"' + detalhe + '"}').encode()
+    await responder(send, status_code, "application/json", corpo)
+
+
+# ===========================================
+# MIDDLEWARE DE IDEMPOTÊNCIA
+# ===========================================
+# Quando um POST de /pedidos traz o header Idempotency-Key, a primeira resposta é salva (em memória e na
+# tabela chaves_idempotencia). Repetições com a mesma chave recebem a resposta salva sem executar a rota
+# de novo, ou seja, sem tocar nas tabelas de pedidos. Regras:
+# - mesma chave com outro corpo de requisição: 422
+# - mesma chave enquanto a primeira requisição ainda está em andamento: 409
+# - respostas 5xx não são salvas (a repetição executa a rota de novo)
+class MiddlewareIdempotencia:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(PREFIXO_ROTAS):
+            return await self.app(scope, receive, send)
+        valor_chave = next((valor.decode() for nome, valor in scope["headers"] if nome == b"idempotency-key"), None)
+        # A chave é separada por usuário; sem um token válido, a própria rota responde com 401
+        id_usuario = identificar_usuario(scope) if valor_chave else None
+        if not valor_chave or id_usuario is None:
+            return await self.app(scope, receive, send)
+
+        # Lê o corpo inteiro para comparar com o da requisição original e depois repassá-lo à rota
+        partes = []
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body"):
+                break
+        corpo_requisicao = b"".join(partes)
+        hash_corpo = hashlib.sha256(corpo_requisicao).hexdigest()
+        chave = f"{id_usuario}:{scope['path']}:{valor_chave}"
+
+        # 1) Resposta já em memória: nenhum acesso ao banco
+        salva = cache_respostas.obter(chave)
+        if salva is None:
+            # 2) Procura na tabela (outro worker pode ter atendido a primeira requisição) ou reserva a chave
+            salva = await self.reservar_chave(chave, hash_corpo)
+        if salva == "em_andamento":
+            return await responder_erro(send, 409, "Requisição com essa Idempotency-Key ainda em andamento")
+        if salva is not None:
+            hash_original, status_code, tipo_conteudo, corpo = salva
+            if hash_original != hash_corpo:
+                return await responder_erro(send, 422, "Idempotency-Key já usada com outro corpo de requisição")
+            return await responder(send, status_code, tipo_conteudo, corpo, repeticao=True)
+
+        # 3) Primeira vez: executa a rota guardando a resposta
+        corpo_entregue = False
+        async def receber():
+            nonlocal corpo_entregue
+            if not corpo_entregue:
+                corpo_entregue = True
+                return {"type": "http.request", "body": corpo_requisicao, "more_body": False}
+            return await receive()
+
+        resposta = {"status": 500, "tipo_conteudo": "application/json", "partes": []}
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                resposta["status"] = mensagem["status"]
+                for nome, valor in mensagem.get("headers", []):
+                    if nome.lower() == b"content-type":
+                        resposta["tipo_conteudo"] = valor.decode()
+            elif mensagem["type"] == "http.response.body":
+                resposta["partes"].append(mensagem.get("body", b""))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receber, enviar)
+        finally:
+            await self.concluir(chave, hash_corpo, resposta)
+
+    async def reservar_chave(self, chave, hash_corpo):
+        agora = int(time.time())
+        async with SessionAsync() as session:
+            registro = await session.scalar(select(ChaveIdempotencia).where(ChaveIdempotencia.chave == chave))
+            if registro is not None and registro.expira_em <= agora:
+                await session.delete(registro)
+                await session.flush()
+                registro = None
+            if registro is None:
+                # Reserva curta: se o worker cair antes do concluir, a chave volta a ficar livre em poucos segundos
+                # (o concluir estende a validade para IDEMPOTENCIA_TTL_SEGUNDOS junto com a resposta)
+                session.add(ChaveIdempotencia(chave, hash_corpo, agora + IDEMPOTENCIA_RESERVA_SEGUNDOS))
+                try:
+                    await session.commit()
+                    return None # Chave reservada: a rota deve ser executada
+                except IntegrityError:
+                    # Outra requisição reservou a mesma chave ao mesmo tempo
+                    await session.rollback()
+                    registro = await session.scalar(select(ChaveIdempotencia).where(ChaveIdempotencia.chave == chave))
+            if registro is None or registro.status_code is None:
+                return "em_andamento"
+            salva = (registro.hash_corpo, registro.status_code, registro.tipo_conteudo, registro.corpo)
+            cache_respostas.definir(chave, salva, ttl_segundos=registro.expira_em - agora)
+            return salva
+
+    async def concluir(self, chave, hash_corpo, resposta):
+        async with SessionAsync() as session:
+            registro = await session.get(ChaveIdempotencia, chave)
+            if registro is None:
+                return
+            if resposta["status"] >= 500:
+                # Erro do servidor: libera a chave para que a repetição execute a rota de novo
+                await session.delete(registro)
+            else:
+                corpo = b"".join(resposta["partes"])
+                registro.status_code = resposta["status"]
+                registro.tipo_conteudo = resposta["tipo_conteudo"]
+                registro.corpo = corpo
+                registro.expira_em = int(time.time()) + IDEMPOTENCIA_TTL_SEGUNDOS
+                cache_respostas.definir(chave, (hash_corpo, resposta["status"], resposta["tipo_conteudo"], corpo))
+            await session.commit()
+
+
+async def limpar_chaves_expiradas(session):
+    await session.execute(delete(ChaveIdempotencia).where(ChaveIdempotencia.expira_em <= int(time.time())))
+    await session.commit()
\ No newline at end of file
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from dependencies import identificar_usuario
+from metricas import requisicoes_limitadas, registrar_coletor
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+# ===========================================
+# CONFIGURAÇÃO (pode ser ajustada no arquivo .env)
+# ===========================================
+# Cada limite é "capacidade/janela em segundos": até "capacidade" requisições seguidas, recarregando
+# na velocidade de "capacidade" por janela (ex: "10/60" = rajada de 10 e depois 1 a cada 6 segundos).
+# Um limite vazio ou "0" desliga a regra.
+LIMITE_ATIVO = os.getenv("LIMITE_ATIVO", "true").lower() == "true"
+LIMITE_LOGIN_IP = os.getenv("LIMITE_LOGIN_IP", "10/60") # /auth/login e /auth/login-form (bcrypt a cada tentativa)
+LIMITE_CRIAR_CONTA_IP = os.getenv("LIMITE_CRIAR_CONTA_IP", "5/300") # /auth/criar_conta (bcrypt para gerar o hash)
+LIMITE_REFRESH_IP = os.getenv("LIMITE_REFRESH_IP", "30/60") # /auth/refresh
+LIMITE_PEDIDOS_USUARIO = os.getenv("LIMITE_PEDIDOS_USUARIO", "120/60") # Rotas de /pedidos, por usuário autenticado
+LIMITE_PEDIDOS_IP = os.getenv("LIMITE_PEDIDOS_IP", "600/60") # Rotas de /pedidos, por IP
+LIMITE_BALDES_MAX = int(os.getenv("LIMITE_BALDES_MAX", "100000")) # Baldes mantidos em memória (os parados há mais tempo saem primeiro)
+LIMITE_CONFIAR_PROXY = os.getenv("LIMITE_CONFIAR_PROXY", "false").lower() == "true" # Usa o X-Forwarded-For (só atrás de um proxy confiável)
+# Modo compartilhado: os baldes ficam num arquivo SQLite usado por todos os workers da mesma máquina
+LIMITE_SQLITE_ARQUIVO = os.getenv("LIMITE_SQLITE_ARQUIVO", "") # Vazio = cada worker tem os seus baldes em memória
+
+logger = logging.getLogger(__name__)
+
+
+class Regra:
+    __slots__ = ("nome", "por", "capacidade", "taxa")
+
+    def __init__(self, nome, por, capacidade, janela_segundos):
+        self.nome = nome
+        self.por = por # "ip" ou "usuario"
+        self.capacidade = capacidade
+        self.taxa = capacidade / janela_segundos # Tokens recuperados por segundo
+
+
+def criar_regra(nome, por, especificacao):
+    if not especificacao or especificacao == "0":
+        return None
+    capacidade, janela = especificacao.split("/")
+    return Regra(nome, por, int(capacidade), float(janela))
+
+
+def agrupar(*regras):
+    return [regra for regra in regras if regra is not None]
+
+
+regras_login = agrupar(criar_regra("login", "ip", LIMITE_LOGIN_IP))
+
+# Rotas com regras próprias (consulta O(1) pelo caminho exato)
+REGRAS_ROTAS = {
+    "/auth/login": regras_login,
+    "/auth/login-form": regras_login, # Mesmo balde do /auth/login: trocar de rota não dá tentativas extras
+    "/auth/criar_conta": agrupar(criar_regra("criar_conta", "ip", LIMITE_CRIAR_CONTA_IP)),
+    "/auth/refresh": agrupar(criar_regra("refresh", "ip", LIMITE_REFRESH_IP)),
+}
+
+# Prefixos com regras compartilhadas por todas as rotas abaixo deles
+REGRAS_PREFIXOS = [
+    ("/pedidos", agrupar(criar_regra("pedidos_usuario", "usuario", LIMITE_PEDIDOS_USUARIO), criar_regra("pedidos_ip", "ip", LIMITE_PEDIDOS_IP))),
+]
+
+
+def regras_da_rota(caminho):
+    regras = REGRAS_ROTAS.get(caminho)
+    if regras is not None:
+        return regras
+    for prefixo, regras in REGRAS_PREFIXOS:
+        if caminho.startswith(prefixo):
+            return regras
+    return ()
+
+
+# ===========================================
+# BALDES EM MEMÓRIA (UM CONJUNTO POR WORKER)
+# ===========================================
+class BaldesMemoria:
+    def __init__(self, tamanho_maximo):
+        self.tamanho_maximo = tamanho_maximo
+        self.baldes = OrderedDict() # (regra, ip ou usuário) -> [tokens, instante da última atualização]
+
+    # Retorna 0 se a requisição pode seguir ou os segundos até haver um token disponível
+    async def consumir(self, regra, chave, agora):
+        balde = self.baldes.get(chave)
+        if balde is None:
+            balde = self.baldes[chave] = [regra.capacidade, agora]
+            # Remove o balde parado há mais tempo: quem ficou parado por uma janela inteira já estaria cheio,
+            # então descartá-lo equivale a recriá-lo cheio depois
+            if len(self.baldes) > self.tamanho_maximo:
+                self.baldes.popitem(last=False)
+        else:
+            self.baldes.move_to_end(chave)
+            balde[0] = min(regra.capacidade, balde[0] + (agora - balde[1]) * regra.taxa)
+            balde[1] = agora
+        if balde[0] >= 1:
+            balde[0] -= 1
+            return 0
+        return (1 - balde[0]) / regra.taxa
+
+
+# ===========================================
+# BALDES COMPARTILHADOS EM SQLITE (TODOS OS WORKERS)
+# ===========================================
+# Um único UPSERT atualiza e consome o balde de forma atômica (o SQLite serializa as escritas entre os
+# processos). O arquivo é separado do banco principal, então funciona também com o Postgres. A consulta roda
+# numa thread, para que a espera pelo arquivo travado por outro worker não pare o event loop.
+SQL_CONSUMIR = """
+INSERT INTO baldes (chave, tokens, atualizado_em, permitido) VALUES (:chave, :capacidade - 1, :agora, 1)
+ON CONFLICT (chave) DO UPDATE SET
+    tokens = min(:capacidade, tokens + (:agora - atualizado_em) * :taxa) - (min(:capacidade, tokens + (:agora - atualizado_em) * :taxa) >= 1),
+    permitido = min(:capacidade, tokens + (:agora - atualizado_em) * :taxa) >= 1,
+    atualizado_em = :agora
+RETURNING tokens, permitido
+"""
+
+# A cada quantas consultas os baldes parados são apagados do arquivo
+INTERVALO_LIMPEZA = 10000
+
+
+class BaldesSQLite:
+    def __init__(self, arquivo, janela_maxima):
+        self.arquivo = arquivo
+        self.janela_maxima = janela_maxima # Um balde parado por mais tempo que isso já estaria cheio
+        self.conexao = None
+        self.consultas = 0
+        self.trava = threading.Lock() # Uma conexão sqlite3 não pode ser usada por duas threads ao mesmo tempo
+
+    def conectar(self):
+        # Aberta no primeiro uso, já dentro do processo do worker
+        conexao = sqlite3.connect(self.arquivo, isolation_level=None, timeout=0.05, check_same_thread=False)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=OFF") # Perder os baldes numa queda de energia não é um problema
+        conexao.execute("CREATE TABLE IF NOT EXISTS baldes (chave TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado_em REAL NOT NULL, permitido INTEGER NOT NULL)")
+        self.conexao = conexao
+
+    async def consumir(self, regra, chave, agora):
+        return await asyncio.to_thread(self.consumir_na_thread, regra, chave, agora)
+
+    def consumir_na_thread(self, regra, chave, agora):
+        with self.trava:
+            return self.consultar(regra, chave, agora)
+
+    def consultar(self, regra, chave, agora):
+        try:
+            if self.conexao is None:
+                self.conectar()
+            tokens, permitido = self.conexao.execute(SQL_CONSUMIR, {"chave": f"{chave[0]}:{chave[1]}", "capacidade": regra.capacidade, "taxa": regra.taxa, "agora": agora}).fetchone()
+            self.consultas += 1
+            if self.consultas % INTERVALO_LIMPEZA == 0:
+                self.conexao.execute("DELETE FROM baldes WHERE atualizado_em < ?", (agora - self.janela_maxima,))
+        except sqlite3.Error:
+            # Arquivo travado por mais de 50 ms ou indisponível: deixa a requisição passar em vez de fazê-la esperar
+            logger.warning("Falha ao consultar os baldes de limite de requisições", exc_info=True)
+            return 0
+        return 0 if permitido else (1 - tokens) / regra.taxa
+
+
+todas_regras = [regra for regras in list(REGRAS_ROTAS.values()) + [regras for _, regras in REGRAS_PREFIXOS] for regra in regras]
+
+if LIMITE_SQLITE_ARQUIVO:
+    baldes = BaldesSQLite(LIMITE_SQLITE_ARQUIVO, max((regra.capacidade / regra.taxa for regra in todas_regras), default=0))
+else:
+    baldes = BaldesMemoria(LIMITE_BALDES_MAX)
+    registrar_coletor(lambda: ["# TYPE limite_baldes_em_memoria gauge", f"limite_baldes_em_memoria {len(baldes.baldes)}"])
+
+
+# ===========================================
+# MIDDLEWARE DE LIMITE DE REQUISIÇÕES
+# ===========================================
+# Roda antes do roteamento: uma requisição recusada recebe 429 sem chegar às dependências, ao bcrypt
+# (autenticar_usuario) ou ao banco de dados
+def ip_do_cliente(scope):
+    if LIMITE_CONFIAR_PROXY:
+        # Só o último endereço foi acrescentado pelo proxy confiável; os anteriores vêm do próprio cliente e
+        # podem ser inventados a cada requisição (ex: nginx com $proxy_add_x_forwarded_for)
+        encaminhado = None
+        for nome, valor in scope["headers"]:
+            if nome == b"x-forwarded-for":
+                encaminhado = valor
+        if encaminhado:
+            return encaminhado.split(b",")[-1].strip().decode()
+    # O uvicorn (proxy_headers=True no servidor.py) já troca o client pelo IP informado pelos proxies de FORWARDED_ALLOW_IPS
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "desconhecido"
+
+
+async def responder_429(send, espera):
+    corpo = b'{"detail":"Muitas requisicoes, tente novamente mais tarde"}'
+    await send({"type": "http.response.start", "status": 429, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(corpo)).encode()),
+        (b"retry-after", str(max(1, math.ceil(espera))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+class MiddlewareLimiteRequisicoes:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not LIMITE_ATIVO:
+            return await self.app(scope, receive, send)
+        regras = regras_da_rota(scope["path"])
+        if regras:
+            agora = time.time()
+            for regra in regras:
+                if regra.por == "ip":
+                    identificador = ip_do_cliente(scope)
+                else:
+                    # Sem um token válido não há usuário; a própria rota responde com 401 (a regra por IP continua valendo)
+                    identificador = identificar_usuario(scope)
+                    if identificador is None:
+                        continue
+                espera = await baldes.consumir(regra, (regra.nome, identificador), agora)
+                if espera:
+                    requisicoes_limitadas.somar(1, regra.nome)
+                    return await responder_429(send, espera)
+        await self.app(scope, receive, send)
@@ -0,0 +1,218 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from contextvars import ContextVar # Guarda as estatísticas de SQL da requisição atual (cada requisição tem o seu contexto)
+from sqlalchemy import event
+from models import estatisticas_pool
+import bisect
+import logging
+import os
+import threading
+import time
+
+# Requisições mais lentas que esse limite são registradas no log com as instruções SQL executadas (0 desliga)
+METRICAS_LIMITE_LENTO_MS = float(os.getenv("METRICAS_LIMITE_LENTO_MS", "500"))
+
+logger = logging.getLogger(__name__)
+
+# ===========================================
+# MÉTRICAS NO FORMATO DO PROMETHEUS
+# ===========================================
+class Histograma:
+    def __init__(self, nome, descricao, limites, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = limites # Limites superiores de cada faixa (o "+Inf" é implícito)
+        self.rotulos = rotulos
+        self.series = {} # valores dos rótulos -> [contagem por faixa, soma, total]
+        self.trava = threading.Lock() # O bcrypt registra tempos a partir das threads do pool
+
+    def observar(self, valor, *valores_rotulos):
+        with self.trava:
+            serie = self.series.get(valores_rotulos)
+            if serie is None:
+                serie = self.series[valores_rotulos] = [[0] * len(self.limites), 0.0, 0]
+            indice = bisect.bisect_left(self.limites, valor)
+            if indice < len(self.limites):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self.trava:
+            for valores_rotulos, (contagens, soma, total) in self.series.items():
+                rotulos = formatar_rotulos(self.rotulos, valores_rotulos)
+                acumulado = 0
+                for limite, contagem in zip(self.limites, contagens):
+                    acumulado += contagem
+                    linhas.append(f"{self.nome}_bucket{formatar_rotulos(self.rotulos + ('le',), valores_rotulos + (limite,))} {acumulado}")
+                linhas.append(f"{self.nome}_bucket{formatar_rotulos(self.rotulos + ('le',), valores_rotulos + ('+Inf',))} {total}")
+                linhas.append(f"{self.nome}_sum{rotulos} {soma}")
+                linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+class Contador:
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self.series = {}
+        self.trava = threading.Lock()
+
+    def somar(self, valor, *valores_rotulos):
+        with self.trava:
+            self.series[valores_rotulos] = self.series.get(valores_rotulos, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self.trava:
+            for valores_rotulos, valor in self.series.items():
+                linhas.append(f"{self.nome}{formatar_rotulos(self.rotulos, valores_rotulos)} {valor}")
+        return linhas
+
+
+def formatar_rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    pares = ",".join(f'{nome}="{str(valor)}"' for nome, valor in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+duracao_requisicoes = Histograma("http_requisicao_duracao_segundos", "Tempo de resposta por rota", LIMITES_SEGUNDOS, ("metodo", "rota"))
+requisicoes = Contador("http_requisicoes_total", "Requisições atendidas por rota e status", ("metodo", "rota", "status"))
+instrucoes_por_requisicao = Histograma("sql_instrucoes_por_requisicao", "Instruções SQL executadas em cada requisição", (0, 1, 2, 3, 5, 10, 20, 50, 100), ("rota",))
+instrucoes_sql = Contador("sql_instrucoes_total", "Instruções SQL executadas por rota", ("rota",))
+duracao_sql = Contador("sql_duracao_segundos_total", "Tempo gasto em instruções SQL por rota", ("rota",))
+duracao_bcrypt = Histograma("bcrypt_duracao_segundos", "Tempo de cada hash/verificação do bcrypt", LIMITES_SEGUNDOS, ("operacao",))
+duracao_jwt = Histograma("jwt_decode_duracao_segundos", "Tempo de cada jwt.decode", LIMITES_SEGUNDOS)
+requisicoes_limitadas = Contador("http_requisicoes_limitadas_total", "Requisições recusadas com 429 pelo limite de requisições", ("regra",))
+operacoes_por_lote = Histograma("escrita_operacoes_por_lote", "Operações gravadas em cada commit do group commit", (1, 2, 4, 8, 16, 32, 64, 128))
+pedidos_arquivados = Contador("pedidos_arquivados_total", "Pedidos encerrados movidos para as tabelas de arquivo por este worker")
+leituras_arquivo = Contador("pedidos_leituras_arquivo_total", "Leituras que precisaram consultar as tabelas de arquivo", ("rota",))
+
+metricas_registradas = [duracao_requisicoes, requisicoes, instrucoes_por_requisicao, instrucoes_sql, duracao_sql, duracao_bcrypt, duracao_jwt, requisicoes_limitadas, operacoes_por_lote, pedidos_arquivados, leituras_arquivo]
+
+# Funções extras que geram linhas no /metrics (ex: caches registrados em outros módulos)
+coletores = []
+
+def registrar_coletor(coletor):
+    coletores.append(coletor)
+
+def coletar_pool():
+    linhas = [
+        "# HELP db_pool_checkouts_total Conexões retiradas do pool",
+        "# TYPE db_pool_checkouts_total counter",
+        "# HELP db_pool_espera_segundos_total Tempo total esperando uma conexão livre",
+        "# TYPE db_pool_espera_segundos_total counter",
+        "# HELP db_pool_espera_max_segundos Maior espera por uma conexão livre",
+        "# TYPE db_pool_espera_max_segundos gauge",
+    ]
+    for nome_pool, estatisticas in estatisticas_pool().items():
+        linhas.append(f'db_pool_checkouts_total{{pool="{nome_pool}"}} {estatisticas["checkouts"]}')
+        linhas.append(f'db_pool_espera_segundos_total{{pool="{nome_pool}"}} {estatisticas["espera_total_ms"] / 1000}')
+        linhas.append(f'db_pool_espera_max_segundos{{pool="{nome_pool}"}} {estatisticas["espera_max_ms"] / 1000}')
+    return linhas
+
+registrar_coletor(coletar_pool)
+
+
+def coletor_cache(nome, cache):
+    # Gera um coletor com os acertos, erros e tamanho de um CacheTTL (ex: cache_usuarios_hits_total)
+    def coletar():
+        estatisticas = cache.estatisticas()
+        return [
+            f"# TYPE {nome}_hits_total counter",
+            f"{nome}_hits_total {estatisticas['hits']}",
+            f"# TYPE {nome}_misses_total counter",
+            f"{nome}_misses_total {estatisticas['misses']}",
+            f"# TYPE {nome}_taxa_acerto gauge",
+            f"{nome}_taxa_acerto {estatisticas['taxa_acerto']}",
+            f"# TYPE {nome}_entradas gauge",
+            f"{nome}_entradas {estatisticas['entradas']}",
+        ]
+    return coletar
+
+
+# ===========================================
+# CONTAGEM DAS INSTRUÇÕES SQL DE CADA REQUISIÇÃO
+# ===========================================
+sql_requisicao = ContextVar("sql_requisicao", default=None)
+
+def antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_sql", []).append(time.perf_counter())
+
+def depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    duracao = time.perf_counter() - conn.info["inicio_sql"].pop()
+    estatisticas = sql_requisicao.get()
+    if estatisticas is not None:
+        estatisticas["quantidade"] += 1
+        estatisticas["duracao"] += duracao
+        if METRICAS_LIMITE_LENTO_MS:
+            estatisticas["instrucoes"].append(statement)
+
+def instrumentar_engines(*engines):
+    # Chamada quando os engines são criados (dependencies.iniciar_banco)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", antes_de_executar)
+        event.listen(engine, "after_cursor_execute", depois_de_executar)
+
+
+# ===========================================
+# MIDDLEWARE QUE MEDE CADA REQUISIÇÃO
+# ===========================================
+class MiddlewareMetricas:
+    # Middleware ASGI puro (sem o custo do BaseHTTPMiddleware e compatível com respostas em streaming)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        estatisticas = {"quantidade": 0, "duracao": 0.0, "instrucoes": []}
+        token = sql_requisicao.set(estatisticas)
+        status = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            sql_requisicao.reset(token)
+            # Usa o caminho da rota (ex: /pedidos/pedido/{id_pedido}) para não criar uma série por ID
+            rota = getattr(scope.get("route"), "path", "desconhecida")
+            metodo = scope["method"]
+            duracao_requisicoes.observar(duracao, metodo, rota)
+            requisicoes.somar(1, metodo, rota, status)
+            instrucoes_por_requisicao.observar(estatisticas["quantidade"], rota)
+            instrucoes_sql.somar(estatisticas["quantidade"], rota)
+            duracao_sql.somar(estatisticas["duracao"], rota)
+            if METRICAS_LIMITE_LENTO_MS and duracao * 1000 >= METRICAS_LIMITE_LENTO_MS:
+                logger.warning(
+                    "Requisição lenta: %s %s levou %.1f ms (%d instruções SQL, %.1f ms no banco)\n%s",
+                    metodo, rota, duracao * 1000, estatisticas["quantidade"], estatisticas["duracao"] * 1000,
+                    "\n".join(estatisticas["instrucoes"]),
+                )
+
+
+# ===========================================
+# ROTA /metrics
+# ===========================================
+metricas_router = APIRouter()
+
+@metricas_router.get("/metrics", include_in_schema=False)
+async def exportar_metricas():
+    linhas = []
+    for metrica in metricas_registradas:
+        linhas.extend(metrica.exportar())
+    for coletor in coletores:
+        linhas.extend(coletor())
+    return PlainTextResponse("\n".join(linhas) + "\n", media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -1,18 +1,138 @@
 # Importações necessárias
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from dependencies import pegar_sessao, verificar_token
-from schemas import PedidoSchema, ItemPedidoSchema, ResponsePedidoSchema
-from models import Pedido, Usuario, ItemPedido
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import pegar_sessao_async, verificar_token, UsuarioAutenticado, SessionAsync, repetir_se_bloqueado
+from schemas import PedidoSchema, ItemPedidoSchema, PaginaPedidosSchema, RespostaStatusPedidoSchema, RespostaVisualizarPedidoSchema, RespostaRemoverItemSchema
+from models import Pedido, ItemPedido, PedidoArquivado, ItemPedidoArquivado, AgregadoStatus, AgregadoReceitaDiaria, AgregadoItens, para_dinheiro, arredondar_dinheiro
+from cache import CacheTTL
+from metricas import registrar_coletor, coletor_cache, leituras_arquivo
+import agregados
+import eventos
+from escrita_em_lote import fila_escrita
+from arquivamento import pode_estar_arquivado
+from typing import List, Literal, Optional
+from datetime import timedelta
+import base64
+import hashlib
+import os
+import csv
+import io
+import json
 
 # Criação do roteador para pedidos, com prefixo e dependência de autenticação
 order_router = APIRouter(
-    prefix="/pedidos", 
-    tags=["pedidos"], 
+    prefix="/pedidos",
+    tags=["pedidos"],
     dependencies=[Depends(verificar_token)] # Todas as rotas exigem token
 )
 
+# Tamanho das páginas nas listagens de pedidos
+TAMANHO_PAGINA_PADRAO = 50
+TAMANHO_PAGINA_MAXIMO = 200
+
+# Quantidade máxima de itens aceitos numa única inclusão em lote
+MAXIMO_ITENS_LOTE = 500
+
+# Quantidade de linhas lidas do banco por vez na exportação
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+# ===========================================
+# CACHE DOS PEDIDOS SERIALIZADOS (visualizar_pedido)
+# ===========================================
+# id do pedido -> (id do dono, corpo JSON pronto, ETag). As rotas que alteram um pedido invalidam a entrada.
+# Cada worker tem o seu cache, então o TTL curto limita por quanto tempo um worker pode ver um pedido
+# alterado por outro worker.
+PEDIDOS_CACHE_TTL_SEGUNDOS = float(os.getenv("PEDIDOS_CACHE_TTL_SEGUNDOS", "5"))
+PEDIDOS_CACHE_MAX = int(os.getenv("PEDIDOS_CACHE_MAX", "10000"))
+cache_pedidos = CacheTTL(tamanho_maximo=PEDIDOS_CACHE_MAX, ttl_segundos=PEDIDOS_CACHE_TTL_SEGUNDOS)
+registrar_coletor(coletor_cache("cache_pedidos", cache_pedidos))
+
+adaptador_visualizar_pedido = TypeAdapter(RespostaVisualizarPedidoSchema)
+
+def invalidar_pedido(id_pedido):
+    cache_pedidos.invalidar(id_pedido)
+
+def pedido_alterado(pedido):
+    # Chamado depois do commit: descarta a resposta em cache e avisa quem acompanha o pedido por SSE
+    invalidar_pedido(pedido.id)
+    eventos.publicar_pedido(pedido)
+
+# ===========================================
+# EXECUÇÃO DAS ALTERAÇÕES DE PEDIDOS (COMMIT PRÓPRIO OU GROUP COMMIT)
+# ===========================================
+# "operacao" recebe a sessão, faz as leituras, validações e escritas sem commit e devolve (resposta, pedido).
+# Com ESCRITA_EM_LOTE=true, a operação vai para a fila de escrita e é gravada junto com as de outras
+# requisições num único commit; senão, roda na sessão da própria requisição. Nos dois casos a resposta
+# só é devolvida depois do commit.
+async def executar_escrita(session, operacao):
+    if fila_escrita.ativa:
+        # A sessão da requisição (usada pelo verificar_token) devolve a sua conexão ao pool antes de esperar o lote:
+        # senão cada requisição na fila prende uma conexão e a tarefa de escrita fica sem nenhuma para gravar
+        await session.close()
+        resposta, pedido = await fila_escrita.enviar(operacao)
+    else:
+        resposta, pedido = await operacao(session)
+        await session.commit()
+    pedido_alterado(pedido)
+    return resposta
+
+def serializar_pedido(pedido):
+    resposta = adaptador_visualizar_pedido.validate_python({"quantidade_itens_pedido": len(pedido.itens), "pedido": pedido}, from_attributes=True)
+    corpo = adaptador_visualizar_pedido.dump_json(resposta)
+    etag = '"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+    return pedido.usuario, corpo, etag
+
+# ===========================================
+# PAGINAÇÃO POR CURSOR (KEYSET) NAS LISTAGENS
+# ===========================================
+# O cursor guarda o ID do último pedido da página; a próxima página busca "id > cursor" pelo índice
+# da chave primária, então o custo não cresce com o número da página (ao contrário de OFFSET).
+# Os pedidos arquivados entram na mesma sequência de IDs: cada página junta as duas tabelas pelo ID.
+def codificar_cursor(id_pedido):
+    return base64.urlsafe_b64encode(str(id_pedido).encode()).decode()
+
+def decodificar_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+async def paginar_pedidos(session, cursor, limite, status=None, id_usuario=None, rota="listar"):
+    ultimo_id = decodificar_cursor(cursor) if cursor else None
+    modelos = [Pedido, PedidoArquivado] if pode_estar_arquivado(status) else [Pedido]
+    pedidos = []
+    for modelo in modelos:
+        consulta = select(modelo)
+        if status:
+            consulta = consulta.where(modelo.status == status)
+        if id_usuario is not None:
+            consulta = consulta.where(modelo.usuario == id_usuario)
+        if ultimo_id is not None:
+            consulta = consulta.where(modelo.id > ultimo_id)
+        # Busca um pedido a mais só para saber se existe uma próxima página
+        consulta = consulta.order_by(modelo.id).limit(limite + 1).options(selectinload(modelo.itens))
+        pedidos.extend((await session.scalars(consulta)).all())
+    if len(modelos) > 1:
+        leituras_arquivo.somar(1, rota)
+        pedidos = sorted(pedidos, key=lambda pedido: pedido.id)[:limite + 1]
+    proximo_cursor = codificar_cursor(pedidos[limite - 1].id) if len(pedidos) > limite else None
+    return pedidos[:limite], proximo_cursor
+
+# ===========================================
+# ATUALIZAÇÃO INCREMENTAL DO PREÇO DO PEDIDO
+# ===========================================
+async def atualizar_preco_pedido(session, id_pedido, diferenca):
+    # O "preco = preco + diferenca" é feito pelo próprio banco, então duas requisições
+    # alterando o mesmo pedido ao mesmo tempo não sobrescrevem o valor uma da outra
+    await session.execute(
+        update(Pedido).where(Pedido.id == id_pedido).values(preco=arredondar_dinheiro(Pedido.preco + diferenca)),
+        execution_options={"synchronize_session": "fetch"} # Atualiza o objeto Pedido já carregado na sessão
+    )
+
 @order_router.get("/")
 async def pedidos():
     """
@@ -21,119 +141,353 @@ async def pedidos():
     return {"mensagem": "Você acessou a rota de pedidos"}
 
 @order_router.post("/pedido")
-async def criar_pedido(pedido_schema: PedidoSchema, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+@repetir_se_bloqueado
+async def criar_pedido(pedido_schema: PedidoSchema, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
     # Verifica se o usuário é admin ou se está criando pedido para si mesmo
     if not usuario.admin and usuario.id != pedido_schema.id_usuario:
         raise HTTPException(status_code=403, detail="Você só pode criar pedidos para você mesmo")
     # Cria o novo pedido
     novo_pedido = Pedido(usuario=pedido_schema.id_usuario)
     session.add(novo_pedido)
-    session.commit()
+    await agregados.registrar_pedido_criado(session, novo_pedido)
+    await session.commit()
+    eventos.publicar_pedido(novo_pedido)
     return {"mensagem": f"Pedido criado com sucesso. ID do pedido: {novo_pedido.id}"}
 
-@order_router.post("/pedido/cancelar/{id_pedido}")
-async def cancelar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Busca o pedido no banco de dados
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
-        raise HTTPException(status_code=400, detail="Pedido não encontrado")
-    # Verifica se o usuário tem permissão para cancelar
-    if not usuario.admin and usuario.id != pedido.usuario:
-        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa verificação")
-    # Atualiza o status do pedido para CANCELADO
-    pedido.status = "CANCELADO"
-    session.commit()
-    return {
-        "mensagem": f"Pedido número: {pedido.id} cancelado com sucesso",
-        "pedido": pedido
-    }
+@order_router.post("/pedido/cancelar/{id_pedido}", response_model=RespostaStatusPedidoSchema)
+@repetir_se_bloqueado
+async def cancelar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    async def operacao(session):
+        # Busca o pedido no banco de dados, travando a linha até o commit (SELECT ... FOR UPDATE; ignorado no SQLite)
+        pedido = await session.scalar(select(Pedido).where(Pedido.id == id_pedido).with_for_update())
+        if not pedido:
+            raise HTTPException(status_code=400, detail="Pedido não encontrado")
+        # Verifica se o usuário tem permissão para cancelar
+        if not usuario.admin and usuario.id != pedido.usuario:
+            raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa verificação")
+        # Atualiza o status do pedido para CANCELADO (e os agregados das análises, na mesma transação)
+        await agregados.registrar_mudanca_status(session, pedido, "CANCELADO")
+        return {
+            "mensagem": f"Pedido número: {pedido.id} cancelado com sucesso",
+            "pedido": pedido
+        }, pedido
+    return await executar_escrita(session, operacao)
 
-@order_router.get("/listar")
-async def listar_pedidos(session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+@order_router.get("/listar", response_model=PaginaPedidosSchema)
+async def listar_pedidos(
+        cursor: Optional[str] = None, # Valor de "proximo_cursor" retornado pela página anterior
+        limite: int = Query(TAMANHO_PAGINA_PADRAO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+        status: Optional[str] = None, # Filtra pelo status (ex: PENDENTE, FINALIZADO)
+        id_usuario: Optional[int] = None, # Filtra pelos pedidos de um usuário
+        session: AsyncSession = Depends(pegar_sessao_async),
+        usuario: UsuarioAutenticado = Depends(verificar_token)
+    ):
     # Apenas admins podem listar todos os pedidos
     if not usuario.admin:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
     else:
-        pedidos = session.query(Pedido).all()
+        # Os itens da página são carregados numa única consulta extra por tabela (sem uma consulta por pedido)
+        pedidos, proximo_cursor = await paginar_pedidos(session, cursor, limite, status, id_usuario)
         return {
-            "pedidos": pedidos
+            "pedidos": pedidos,
+            "proximo_cursor": proximo_cursor
         }
-    
+
 @order_router.post("/pedido/adicionar-item/{id_pedido}")
-async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSchema, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Busca o pedido
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
+@repetir_se_bloqueado
+async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSchema, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    async def operacao(session):
+        # Busca e trava o pedido (os itens não precisam ser carregados)
+        pedido = await session.scalar(select(Pedido).where(Pedido.id == id_pedido).with_for_update())
+        if not pedido:
+            raise HTTPException(status_code=400, detail="Pedido não existente")
+        # Verifica permissão
+        if not usuario.admin and usuario.id != pedido.usuario:
+            raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
+        # Cria e adiciona o item ao pedido
+        item_pedido = ItemPedido(item_pedido_schema.quantidade, item_pedido_schema.sabor, item_pedido_schema.tamanho, item_pedido_schema.preco_unitario, id_pedido)
+        session.add(item_pedido)
+        # Soma só o valor do novo item ao total, na mesma transação
+        await atualizar_preco_pedido(session, id_pedido, item_pedido.subtotal())
+        await agregados.registrar_itens(session, pedido, [(item_pedido.sabor, item_pedido.tamanho, item_pedido.quantidade, item_pedido.subtotal())])
+        return {
+            "mensagem": "Item criado com sucesso",
+            "item_id": item_pedido.id,
+            "preco_pedido": pedido.preco
+        }, pedido
+    return await executar_escrita(session, operacao)
+
+@order_router.post("/pedido/adicionar-itens/{id_pedido}")
+@repetir_se_bloqueado
+async def adicionar_itens_pedido(id_pedido: int, itens_pedido_schema: List[ItemPedidoSchema], session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    """
+    Adiciona vários itens ao pedido de uma vez. A operação é tudo ou nada: se algum item for inválido
+    (erro 422) ou se qualquer passo falhar, nenhum item é gravado e o preço do pedido não muda
+    """
+    if not itens_pedido_schema:
+        raise HTTPException(status_code=400, detail="Informe ao menos um item")
+    if len(itens_pedido_schema) > MAXIMO_ITENS_LOTE:
+        raise HTTPException(status_code=400, detail=f"Envie no máximo {MAXIMO_ITENS_LOTE} itens por requisição")
+    # Busca e trava o pedido
+    pedido = await session.scalar(select(Pedido).where(Pedido.id == id_pedido).with_for_update())
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido não existente")
     # Verifica permissão
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
-    # Cria e adiciona o item ao pedido
-    item_pedido = ItemPedido(item_pedido_schema.quantidade, item_pedido_schema.sabor, item_pedido_schema.tamanho, item_pedido_schema.preco_unitario, id_pedido)
-    session.add(item_pedido)
-    # Recalcula o preço total do pedido
-    pedido.calcular_preco()
-    session.commit()
+    linhas = [
+        {
+            "quantidade": item.quantidade,
+            "sabor": item.sabor,
+            "tamanho": item.tamanho,
+            "preco_unitario": para_dinheiro(item.preco_unitario),
+            "pedido": id_pedido,
+        }
+        for item in itens_pedido_schema
+    ]
+    # Um único INSERT em lote (com os IDs gerados retornados) e uma única atualização do preço, tudo num só commit;
+    # sort_by_parameter_order garante que os IDs voltam na mesma ordem dos itens enviados
+    ids_itens = (await session.scalars(insert(ItemPedido).returning(ItemPedido.id, sort_by_parameter_order=True), linhas)).all()
+    await atualizar_preco_pedido(session, id_pedido, sum((linha["preco_unitario"] * linha["quantidade"] for linha in linhas), para_dinheiro(0)))
+    await agregados.registrar_itens(session, pedido, [(linha["sabor"], linha["tamanho"], linha["quantidade"], linha["preco_unitario"] * linha["quantidade"]) for linha in linhas])
+    await session.commit()
+    pedido_alterado(pedido)
     return {
-        "mensagem": "Item criado com sucesso",
-        "item_id": item_pedido.id,
+        "mensagem": f"{len(ids_itens)} itens criados com sucesso",
+        "itens_ids": ids_itens,
         "preco_pedido": pedido.preco
     }
 
-@order_router.post("/pedido/remover-item/{id_item_pedido}")
-async def remover_item_pedido(id_item_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Busca o item e o pedido correspondente
-    item_pedido = session.query(ItemPedido).filter(ItemPedido.id == id_item_pedido).first()
-    pedido = session.query(Pedido).filter(Pedido.id == item_pedido.pedido).first()
-    if not item_pedido:
-        raise HTTPException(status_code=400, detail="Item no pedido não existente")
-    # Verifica permissão
-    if not usuario.admin and usuario.id != pedido.usuario:
-        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
-    # Remove o item
-    session.delete(item_pedido)
-    # Recalcula o preço do pedido
-    pedido.calcular_preco()
-    session.commit()
-    return {
-        "mensagem": "Item removido com sucesso",
-        "quantidade_itens_pedido": len(pedido.itens),
-        "pedido": pedido
-    }
+@order_router.post("/pedido/remover-item/{id_item_pedido}", response_model=RespostaRemoverItemSchema)
+@repetir_se_bloqueado
+async def remover_item_pedido(id_item_pedido: int, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    async def operacao(session):
+        # Busca o item e o pedido correspondente
+        item_pedido = await session.scalar(select(ItemPedido).where(ItemPedido.id == id_item_pedido))
+        if not item_pedido:
+            raise HTTPException(status_code=400, detail="Item no pedido não existente")
+        # populate_existing recarrega os itens mesmo que o pedido já esteja na sessão (outra operação do mesmo lote)
+        pedido = await session.scalar(
+            select(Pedido).where(Pedido.id == item_pedido.pedido).options(selectinload(Pedido.itens)).with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        # Verifica permissão
+        if not usuario.admin and usuario.id != pedido.usuario:
+            raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
+        # Remove o item
+        pedido.itens.remove(item_pedido)
+        await session.delete(item_pedido)
+        # Subtrai só o valor do item removido do total, na mesma transação
+        await atualizar_preco_pedido(session, pedido.id, -item_pedido.subtotal())
+        await agregados.registrar_itens(session, pedido, [(item_pedido.sabor, item_pedido.tamanho, item_pedido.quantidade, item_pedido.subtotal())], sinal=-1)
+        return {
+            "mensagem": "Item removido com sucesso",
+            "quantidade_itens_pedido": len(pedido.itens),
+            "pedido": pedido
+        }, pedido
+    return await executar_escrita(session, operacao)
 
-@order_router.post("/pedido/finalizar/{id_pedido}")
-async def finalizar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Busca o pedido
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
-        raise HTTPException(status_code=400, detail="Pedido não encontrado")
+@order_router.post("/pedido/finalizar/{id_pedido}", response_model=RespostaStatusPedidoSchema)
+@repetir_se_bloqueado
+async def finalizar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    async def operacao(session):
+        # Busca e trava o pedido
+        pedido = await session.scalar(select(Pedido).where(Pedido.id == id_pedido).with_for_update())
+        if not pedido:
+            raise HTTPException(status_code=400, detail="Pedido não encontrado")
+        # Verifica permissão
+        if not usuario.admin and usuario.id != pedido.usuario:
+            raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa verificação")
+        # Atualiza status do pedido (e os agregados das análises, na mesma transação)
+        await agregados.registrar_mudanca_status(session, pedido, "FINALIZADO")
+        return {
+            "mensagem": f"Pedido número: {pedido.id} finalizado com sucesso",
+            "pedido": pedido
+        }, pedido
+    return await executar_escrita(session, operacao)
+
+@order_router.get("/pedido/{id_pedido}", response_model=RespostaVisualizarPedidoSchema)
+async def visualizar_pedido(id_pedido: int, request: Request, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    entrada = cache_pedidos.obter(id_pedido)
+    if entrada is None:
+        # Busca o pedido já com os itens carregados e guarda a resposta pronta no cache
+        pedido = await session.scalar(select(Pedido).where(Pedido.id == id_pedido).options(selectinload(Pedido.itens)))
+        if not pedido:
+            # Pedidos encerrados antigos ficam nas tabelas de arquivo
+            leituras_arquivo.somar(1, "visualizar_pedido")
+            pedido = await session.scalar(select(PedidoArquivado).where(PedidoArquivado.id == id_pedido).options(selectinload(PedidoArquivado.itens)))
+        if not pedido:
+            raise HTTPException(status_code=400, detail="Pedido não encontrado")
+        entrada = serializar_pedido(pedido)
+        cache_pedidos.definir(id_pedido, entrada)
+    id_dono, corpo, etag = entrada
     # Verifica permissão
-    if not usuario.admin and usuario.id != pedido.usuario:
-        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa verificação")
-    # Atualiza status do pedido
-    pedido.status = "FINALIZADO"
-    session.commit()
-    return {
-        "mensagem": f"Pedido número: {pedido.id} finalizado com sucesso",
-        "pedido": pedido
-    }
+    if not usuario.admin and usuario.id != id_dono:
+        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
+    # O cliente já tem essa versão do pedido: responde 304 sem corpo
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(corpo, media_type="application/json", headers={"ETag": etag})
 
-@order_router.get("/pedido/{id_pedido}")
-async def visualizar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Busca o pedido
-    pedido = session.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
+# ===========================================
+# ACOMPANHAMENTO DOS PEDIDOS EM TEMPO REAL (SERVER-SENT EVENTS)
+# ===========================================
+# Em vez de consultar visualizar_pedido a cada poucos segundos, o cliente abre um stream e recebe um evento
+# "pedido" (id, usuario, status, preco) sempre que o pedido mudar. Nenhuma conexão com o banco fica presa
+# ao stream: a sessão é fechada antes da resposta começar.
+CABECALHOS_SSE = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Desliga o buffer de proxies como o nginx
+
+def verificar_limite_conexoes():
+    if eventos.conexoes_abertas >= eventos.EVENTOS_CONEXOES_MAX:
+        raise HTTPException(status_code=503, detail="Limite de conexões de acompanhamento atingido, tente novamente em instantes")
+
+@order_router.get("/pedido/{id_pedido}/eventos")
+async def acompanhar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    """
+    Stream SSE com o estado atual do pedido seguido de cada alteração. O stream é encerrado quando o pedido
+    é finalizado ou cancelado
+    """
+    verificar_limite_conexoes()
+    linha = (await session.execute(select(Pedido.id, Pedido.usuario, Pedido.status, Pedido.preco).where(Pedido.id == id_pedido))).first()
+    if not linha:
+        # Um pedido arquivado está encerrado: o stream envia o estado final e termina
+        linha = (await session.execute(select(PedidoArquivado.id, PedidoArquivado.usuario, PedidoArquivado.status, PedidoArquivado.preco).where(PedidoArquivado.id == id_pedido))).first()
+    await session.close() # Devolve a conexão ao pool antes do stream começar
+    if not linha:
         raise HTTPException(status_code=400, detail="Pedido não encontrado")
     # Verifica permissão
-    if not usuario.admin and usuario.id != pedido.usuario:
-        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa modificação")
+    if not usuario.admin and usuario.id != linha.usuario:
+        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
+    evento_inicial = eventos.criar_evento(linha.id, linha.usuario, linha.status, linha.preco)
+    return StreamingResponse(
+        eventos.gerar_eventos(eventos.assinaturas_pedido, id_pedido, evento_inicial, encerrar_em_status_final=True),
+        media_type="text/event-stream",
+        headers=CABECALHOS_SSE
+    )
+
+@order_router.get("/eventos")
+async def acompanhar_pedidos_usuario(session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    """
+    Stream SSE com as alterações de todos os pedidos do usuário logado (inclusive pedidos novos)
+    """
+    verificar_limite_conexoes()
+    # Pedidos com ID acima deste, criados em outro worker, são enviados como novos pela sincronização
+    ultimo_id_pedido = await session.scalar(select(func.max(Pedido.id))) or 0
+    # Devolve a conexão ao pool antes do stream começar (também a usada pelo verificar_token sem o auth cache)
+    await session.close()
+    return StreamingResponse(
+        eventos.gerar_eventos(eventos.assinaturas_usuario, usuario.id, ultimo_id_pedido=ultimo_id_pedido),
+        media_type="text/event-stream",
+        headers=CABECALHOS_SSE
+    )
+
+@order_router.get("/listar/pedidos-usuario", response_model=PaginaPedidosSchema)
+async def listar_pedidos_usuario(
+        cursor: Optional[str] = None,
+        limite: int = Query(TAMANHO_PAGINA_PADRAO, ge=1, le=TAMANHO_PAGINA_MAXIMO),
+        status: Optional[str] = None,
+        session: AsyncSession = Depends(pegar_sessao_async),
+        usuario: UsuarioAutenticado = Depends(verificar_token)
+    ):
+    # Retorna os pedidos do usuário logado, página por página, com os itens carregados numa única consulta extra
+    pedidos, proximo_cursor = await paginar_pedidos(session, cursor, limite, status, usuario.id, rota="listar_pedidos_usuario")
+    return {"pedidos": pedidos, "proximo_cursor": proximo_cursor}
+
+
+# ===========================================
+# EXPORTAÇÃO COMPLETA DOS PEDIDOS (STREAMING)
+# ===========================================
+COLUNAS_EXPORTACAO = ["id_pedido", "status", "usuario", "preco", "id_item", "quantidade", "sabor", "tamanho", "preco_unitario"]
+
+async def ler_lotes_exportacao(session):
+    # Pedidos das tabelas principais e depois os arquivados; os IDs nunca se repetem entre as duas
+    # (pedidos e itens_pedido usam AUTOINCREMENT no SQLite e sequências no Postgres)
+    for modelo, modelo_itens in ((Pedido, ItemPedido), (PedidoArquivado, ItemPedidoArquivado)):
+        consulta = (
+            select(modelo.id, modelo.status, modelo.usuario, modelo.preco,
+                   modelo_itens.id, modelo_itens.quantidade, modelo_itens.sabor, modelo_itens.tamanho, modelo_itens.preco_unitario)
+            .outerjoin(modelo_itens, modelo_itens.pedido == modelo.id)
+            .order_by(modelo.id, modelo_itens.id)
+            .execution_options(yield_per=TAMANHO_LOTE_EXPORTACAO) # Lê o resultado em lotes, sem carregar tudo na memória
+        )
+        resultado = await session.stream(consulta)
+        async for lote in resultado.partitions():
+            yield lote
+
+async def gerar_exportacao_pedidos(fabrica_sessao, formato):
+    # A sessão é aberta aqui dentro porque o gerador continua rodando depois que a rota retorna
+    async with fabrica_sessao() as session:
+        if formato == "csv":
+            # CSV: uma linha por item (pedidos sem itens aparecem com as colunas do item vazias)
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(COLUNAS_EXPORTACAO)
+            async for lote in ler_lotes_exportacao(session):
+                escritor.writerows(lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            # NDJSON: uma linha por pedido, com os itens agrupados (as linhas chegam ordenadas pelo ID do pedido)
+            pedido_atual = None
+            async for lote in ler_lotes_exportacao(session):
+                linhas = []
+                for id_pedido, status, usuario, preco, id_item, quantidade, sabor, tamanho, preco_unitario in lote:
+                    if pedido_atual is None or pedido_atual["id"] != id_pedido:
+                        if pedido_atual is not None:
+                            linhas.append(json.dumps(pedido_atual, default=float)) # default=float converte os Decimal dos preços
+                        pedido_atual = {"id": id_pedido, "status": status, "usuario": usuario, "preco": preco, "itens": []}
+                    if id_item is not None:
+                        pedido_atual["itens"].append({"id": id_item, "quantidade": quantidade, "sabor": sabor, "tamanho": tamanho, "preco_unitario": preco_unitario})
+                if linhas:
+                    yield "\n".join(linhas) + "\n"
+            if pedido_atual is not None:
+                yield json.dumps(pedido_atual, default=float) + "\n"
+
+@order_router.get("/exportar")
+async def exportar_pedidos(formato: Literal["ndjson", "csv"] = "ndjson", session: AsyncSession = Depends(pegar_sessao_async), usuario: UsuarioAutenticado = Depends(verificar_token)):
+    # Apenas admins podem exportar todos os pedidos
+    if not usuario.admin:
+        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
+    # O gerador abre a sua própria sessão; a da requisição (usada pelo verificar_token sem o auth cache)
+    # devolve a conexão ao pool antes da exportação começar, em vez de ficar presa até o fim do stream
+    await session.close()
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        gerar_exportacao_pedidos(SessionAsync, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=pedidos.{formato}"}
+    )
+
+# ===========================================
+# ANÁLISES DOS PEDIDOS (AGREGADOS PRÉ-CALCULADOS)
+# ===========================================
+# As três consultas leem só as tabelas de agregados (uma linha por status, por dia e por sabor/tamanho),
+# nunca as tabelas pedidos e itens_pedido, então o custo não cresce com a quantidade de pedidos
+@order_router.get("/analises")
+async def analisar_pedidos(
+        dias: int = Query(30, ge=1, le=366), # Quantidade de dias na receita por dia (terminando hoje, em UTC)
+        top: int = Query(10, ge=1, le=100), # Quantidade de combinações de sabor e tamanho mais vendidas
+        session: AsyncSession = Depends(pegar_sessao_async),
+        usuario: UsuarioAutenticado = Depends(verificar_token)
+    ):
+    # Apenas admins podem ver as análises
+    if not usuario.admin:
+        raise HTTPException(status_code=401, detail="Você não tem autorização para fazer essa operação")
+    receita = (await session.scalars(
+        select(AgregadoReceitaDiaria)
+        .where(AgregadoReceitaDiaria.dia > agregados.hoje() - timedelta(days=dias), AgregadoReceitaDiaria.pedidos > 0)
+        .order_by(AgregadoReceitaDiaria.dia)
+    )).all()
+    status = (await session.scalars(select(AgregadoStatus).where(AgregadoStatus.quantidade > 0).order_by(AgregadoStatus.status))).all()
+    itens = (await session.scalars(
+        select(AgregadoItens)
+        .where(AgregadoItens.quantidade > 0)
+        .order_by(AgregadoItens.quantidade.desc(), AgregadoItens.receita.desc())
+        .limit(top)
+    )).all()
     return {
-        "quantidade_itens_pedido": len(pedido.itens),
-        "pedido": pedido
+        "receita_por_dia": [{"dia": linha.dia, "pedidos": linha.pedidos, "receita": linha.receita} for linha in receita],
+        "pedidos_por_status": [{"status": linha.status, "quantidade": linha.quantidade, "valor": linha.valor} for linha in status],
+        "mais_vendidos": [{"sabor": linha.sabor, "tamanho": linha.tamanho, "quantidade": linha.quantidade, "receita": linha.receita} for linha in itens],
     }
-
-@order_router.get("/listar/pedidos-usuario", response_model=List[ResponsePedidoSchema])
-async def listar_pedidos(session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
-    # Retorna todos os pedidos do usuário logado
-    pedidos = session.query(Pedido).filter(Pedido.usuario == usuario.id).all()
-    return pedidos
\ No newline at end of file
@@ -0,0 +1,62 @@
+# ===========================================
+# RECONCILIAÇÃO DOS PREÇOS DOS PEDIDOS
+# ===========================================
+# As rotas mantêm o preço dos pedidos de forma incremental (somando/subtraindo o valor de cada item).
+# Este comando recalcula o total de cada pedido a partir dos itens, em lotes, e mostra os pedidos
+# cujo preço salvo divergiu. Com --corrigir, grava o total recalculado.
+#
+# Para rodar (a partir da raiz do projeto): python reconciliar_precos.py [--corrigir] [--lote 1000]
+import argparse
+from sqlalchemy import select, update, func, type_coerce, Float
+from models import criar_engines, Pedido, ItemPedido, para_dinheiro, arredondar_dinheiro
+
+# Total dos itens de um pedido, calculado pelo banco
+def total_itens(id_pedido):
+    return (
+        select(arredondar_dinheiro(func.coalesce(func.sum(ItemPedido.preco_unitario * ItemPedido.quantidade), 0)))
+        .where(ItemPedido.pedido == id_pedido)
+        .scalar_subquery()
+    )
+
+
+def reconciliar(tamanho_lote, corrigir):
+    db, _ = criar_engines()
+    divergentes = 0
+    ultimo_id = 0
+    while True:
+        # Cada lote é uma transação curta, para não segurar o lock de escrita do SQLite por muito tempo
+        with db.begin() as conexao:
+            lote = conexao.execute(
+                # O preço é lido como está gravado: o Numeric do SQLAlchemy arredondaria para 2 casas e esconderia
+                # um valor como 33.000000000000014 (erro de ponto flutuante acumulado no SQLite)
+                select(Pedido.id, type_coerce(Pedido.preco, Float), total_itens(Pedido.id))
+                .where(Pedido.id > ultimo_id)
+                .order_by(Pedido.id)
+                .limit(tamanho_lote)
+            ).all()
+            if not lote:
+                break
+            for id_pedido, preco_salvo, total_calculado in lote:
+                preco_salvo = 0.0 if preco_salvo is None else float(preco_salvo)
+                total_calculado = para_dinheiro(total_calculado)
+                if preco_salvo != float(total_calculado):
+                    divergentes += 1
+                    print(f"Pedido {id_pedido}: preço salvo {preco_salvo}, total dos itens {total_calculado}")
+                    if corrigir:
+                        # Recalcula dentro do próprio UPDATE para não sobrescrever um item adicionado nesse meio tempo
+                        conexao.execute(update(Pedido).where(Pedido.id == id_pedido).values(preco=total_itens(id_pedido)))
+            ultimo_id = lote[-1][0]
+    acao = "corrigidos" if corrigir else "encontrados"
+    print(f"{divergentes} pedidos com preço divergente {acao}")
+    if corrigir and divergentes:
+        # Os agregados das análises somam os preços antigos
+        print("Execute python reconstruir_agregados.py para atualizar as análises")
+    return divergentes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica (e opcionalmente corrige) o preço salvo dos pedidos")
+    parser.add_argument("--corrigir", action="store_true", help="Grava o total recalculado nos pedidos divergentes")
+    parser.add_argument("--lote", type=int, default=1000, help="Quantidade de pedidos verificados por transação")
+    args = parser.parse_args()
+    reconciliar(args.lote, args.corrigir)
\ No newline at end of file
@@ -0,0 +1,57 @@
+# ===========================================
+# RECONSTRUÇÃO DOS AGREGADOS DAS ANÁLISES
+# ===========================================
+# As rotas mantêm as tabelas de agregados de forma incremental (agregados.py). Este comando apaga e
+# recalcula as três tabelas a partir de pedidos e itens_pedido (e das tabelas de arquivo), numa única transação (as rotas que
+# alteram pedidos esperam o fim dela). Use para preencher os agregados depois da migração que os criou,
+# depois de um "reconciliar_precos.py --corrigir" ou se suspeitar de divergência.
+#
+# Para rodar (a partir da raiz do projeto): python reconstruir_agregados.py
+from sqlalchemy import select, insert, delete, func, union_all
+from models import criar_engines, arredondar_dinheiro, Pedido, ItemPedido, PedidoArquivado, ItemPedidoArquivado, AgregadoStatus, AgregadoReceitaDiaria, AgregadoItens
+
+
+def reconstruir():
+    db, _ = criar_engines()
+    # Os pedidos arquivados continuam contando nas análises
+    pedidos = union_all(
+        select(Pedido.status, Pedido.preco, Pedido.finalizado_em),
+        select(PedidoArquivado.status, PedidoArquivado.preco, PedidoArquivado.finalizado_em),
+    ).subquery()
+    itens_finalizados = union_all(
+        select(ItemPedido.sabor, ItemPedido.tamanho, ItemPedido.quantidade, ItemPedido.preco_unitario)
+        .join(Pedido, Pedido.id == ItemPedido.pedido).where(Pedido.status == "FINALIZADO"),
+        select(ItemPedidoArquivado.sabor, ItemPedidoArquivado.tamanho, ItemPedidoArquivado.quantidade, ItemPedidoArquivado.preco_unitario)
+        .join(PedidoArquivado, PedidoArquivado.id == ItemPedidoArquivado.pedido).where(PedidoArquivado.status == "FINALIZADO"),
+    ).subquery()
+    with db.begin() as conexao:
+        for tabela in (AgregadoStatus, AgregadoReceitaDiaria, AgregadoItens):
+            conexao.execute(delete(tabela))
+        # Cada agregado é um INSERT ... SELECT com GROUP BY: os dados não passam pelo Python
+        conexao.execute(insert(AgregadoStatus).from_select(
+            ["status", "quantidade", "valor"],
+            select(pedidos.c.status, func.count(), arredondar_dinheiro(func.coalesce(func.sum(pedidos.c.preco), 0))).group_by(pedidos.c.status)
+        ))
+        conexao.execute(insert(AgregadoReceitaDiaria).from_select(
+            ["dia", "pedidos", "receita"],
+            select(pedidos.c.finalizado_em, func.count(), arredondar_dinheiro(func.coalesce(func.sum(pedidos.c.preco), 0)))
+            .where(pedidos.c.status == "FINALIZADO", pedidos.c.finalizado_em.is_not(None))
+            .group_by(pedidos.c.finalizado_em)
+        ))
+        conexao.execute(insert(AgregadoItens).from_select(
+            ["sabor", "tamanho", "quantidade", "receita"],
+            select(itens_finalizados.c.sabor, itens_finalizados.c.tamanho, func.sum(itens_finalizados.c.quantidade),
+                   arredondar_dinheiro(func.sum(itens_finalizados.c.preco_unitario * itens_finalizados.c.quantidade)))
+            .group_by(itens_finalizados.c.sabor, itens_finalizados.c.tamanho)
+        ))
+        sem_data = conexao.scalar(select(func.count()).select_from(pedidos).where(pedidos.c.status == "FINALIZADO", pedidos.c.finalizado_em.is_(None)))
+        totais = {tabela.__tablename__: conexao.scalar(select(func.count()).select_from(tabela)) for tabela in (AgregadoStatus, AgregadoReceitaDiaria, AgregadoItens)}
+    for nome_tabela, linhas in totais.items():
+        print(f"{nome_tabela}: {linhas} linhas")
+    if sem_data:
+        # Finalizados antes da coluna finalizado_em existir: contam nos status e nos itens, mas não têm dia
+        print(f"{sem_data} pedidos finalizados sem data ficaram fora da receita por dia")
+
+
+if __name__ == "__main__":
+    reconstruir()
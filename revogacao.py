@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from models import TokenRevogado
+
+# Intervalo em que cada worker busca no banco as revogações feitas pelos outros workers
+REVOGACAO_SINCRONIA_SEGUNDOS = float(os.getenv("REVOGACAO_SINCRONIA_SEGUNDOS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# ===========================================
+# REVOGAÇÕES EM MEMÓRIA
+# ===========================================
+# identificador -> timestamp de expiração. A consulta no caminho quente (verificar_token) é só um
+# "in" num dicionário: O(1) e sem alocar nada. Os registros são persistidos na tabela tokens_revogados,
+# recarregados na inicialização e sincronizados periodicamente entre os workers.
+tokens_revogados = {}
+familias_revogadas = {}
+
+# Maior ID da tabela já carregado (a sincronização só busca registros novos)
+ultimo_id_carregado = 0
+
+
+def esta_revogado(dic_info):
+    return dic_info.get("jti") in tokens_revogados or dic_info.get("fam") in familias_revogadas
+
+
+def token_revogado(jti):
+    return jti in tokens_revogados
+
+
+def familia_revogada(familia):
+    return familia in familias_revogadas
+
+
+def registrar_em_memoria(registro):
+    # Não avança ultimo_id_carregado: um registro gravado por este worker pode ter ID maior que registros de
+    # outros workers ainda não sincronizados, que seriam pulados para sempre (só sincronizar_revogacoes avança)
+    destino = familias_revogadas if registro.tipo == "familia" else tokens_revogados
+    destino[registro.identificador] = registro.expira_em
+
+
+# ===========================================
+# PERSISTÊNCIA E SINCRONIZAÇÃO
+# ===========================================
+async def revogar(session, identificador, tipo, expira_em):
+    # Grava no banco primeiro; só depois do commit a revogação passa a valer neste worker.
+    # Retorna False se o identificador já estava revogado (índice único em tipo + identificador)
+    registro = TokenRevogado(identificador, tipo, int(expira_em))
+    session.add(registro)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        destino = familias_revogadas if tipo == "familia" else tokens_revogados
+        destino[identificador] = int(expira_em)
+        return False
+    registrar_em_memoria(registro)
+    return True
+
+
+async def sincronizar_revogacoes(session):
+    # Carrega as revogações feitas desde a última sincronização (na inicialização, carrega todas as ainda válidas)
+    global ultimo_id_carregado
+    agora = int(time.time())
+    registros = (await session.scalars(
+        select(TokenRevogado)
+        .where(TokenRevogado.id > ultimo_id_carregado, TokenRevogado.expira_em > agora)
+        .order_by(TokenRevogado.id)
+    )).all()
+    for registro in registros:
+        registrar_em_memoria(registro)
+        ultimo_id_carregado = registro.id # Registros em ordem crescente de ID
+    # Remove da memória o que já expirou (um token expirado é recusado pelo próprio jwt.decode)
+    for revogacoes in (tokens_revogados, familias_revogadas):
+        for identificador in [identificador for identificador, expira_em in revogacoes.items() if expira_em <= agora]:
+            del revogacoes[identificador]
+
+
+async def limpar_revogacoes_expiradas(session):
+    await session.execute(delete(TokenRevogado).where(TokenRevogado.expira_em <= int(time.time())))
+    await session.commit()
+
+
+async def manter_revogacoes_sincronizadas(fabrica_sessao):
+    # Tarefa de fundo iniciada junto com a aplicação
+    while True:
+        await asyncio.sleep(REVOGACAO_SINCRONIA_SEGUNDOS)
+        try:
+            async with fabrica_sessao() as session:
+                await sincronizar_revogacoes(session)
+        except Exception:
+            logger.exception("Falha ao sincronizar as revogações de tokens")
\ No newline at end of file
@@ -58,5 +58,63 @@ class ResponsePedidoSchema(BaseModel):
     preco: float                   # Preço total do pedido
     itens: List[ItemPedidoSchema]  # Lista de itens que fazem parte do pedido
 
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Schema de resposta para uma página de pedidos (paginação por cursor)
+# ================================
+class PaginaPedidosSchema(BaseModel):
+    pedidos: List[ResponsePedidoSchema]  # Pedidos da página atual
+    proximo_cursor: Optional[str]        # Cursor para buscar a próxima página (None na última)
+
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Schema de resposta com os dados do pedido sem os itens
+# ================================
+class PedidoResumoSchema(BaseModel):
+    id: int                  # ID do pedido
+    status: str              # Status (ex: PENDENTE, FINALIZADO)
+    usuario: int             # ID do usuário dono do pedido
+    preco: float             # Preço total do pedido
+
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Schema de resposta para cancelar ou finalizar um pedido
+# ================================
+class RespostaStatusPedidoSchema(BaseModel):
+    mensagem: str                # Mensagem de confirmação
+    pedido: PedidoResumoSchema   # Pedido com o status atualizado
+
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Schema de resposta para visualizar um pedido
+# ================================
+class RespostaVisualizarPedidoSchema(BaseModel):
+    quantidade_itens_pedido: int   # Quantidade de itens no pedido
+    pedido: ResponsePedidoSchema   # Pedido completo com os itens
+
+    class Config:
+        from_attributes = True
+
+
+# ================================
+# Schema de resposta para remover um item do pedido
+# ================================
+class RespostaRemoverItemSchema(BaseModel):
+    mensagem: str                  # Mensagem de confirmação
+    quantidade_itens_pedido: int   # Quantidade de itens que restaram no pedido
+    pedido: ResponsePedidoSchema   # Pedido atualizado com os itens
+
     class Config:
         from_attributes = True
\ No newline at end of file
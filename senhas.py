@@ -0,0 +1,69 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from metricas import duracao_bcrypt
+import time
+
+# Configurações do pool de hashing (podem ser ajustadas no arquivo .env)
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "4")) # Threads dedicadas ao bcrypt
+BCRYPT_FILA_MAX = int(os.getenv("BCRYPT_FILA_MAX", "32")) # Operações que podem aguardar na fila além das que estão rodando
+
+# Pool dedicado: o bcrypt libera o GIL enquanto calcula o hash, então threads bastam para tirar o trabalho do event loop
+executor_bcrypt = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Quantidade de operações rodando ou aguardando no pool (só é alterada dentro do event loop)
+operacoes_pendentes = 0
+
+# Contexto de criptografia de senhas (bcrypt), criado no primeiro uso: importar o passlib e carregar o
+# backend do bcrypt custa tempo na inicialização, então isso é feito pelo aquecer_bcrypt() no lifespan
+bcrypt_context = None
+
+def pegar_bcrypt_context():
+    global bcrypt_context
+    if bcrypt_context is None:
+        from passlib.context import CryptContext # Importa o gerenciador de contexto de criptografia de senhas
+        bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return bcrypt_context
+
+# Executa a operação já dentro da thread do pool, medindo só o tempo de CPU do bcrypt (sem a espera na fila)
+def executar_medindo(operacao, funcao, *args):
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args)
+    finally:
+        duracao_bcrypt.observar(time.perf_counter() - inicio, operacao)
+
+
+# ===========================================
+# FUNÇÃO PARA EXECUTAR UMA OPERAÇÃO NO POOL DO BCRYPT
+# ===========================================
+async def executar_no_pool(operacao, funcao, *args):
+    global operacoes_pendentes
+    # Com a fila cheia, responde 503 na hora em vez de acumular logins esperando
+    if operacoes_pendentes >= BCRYPT_WORKERS + BCRYPT_FILA_MAX:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente em instantes", headers={"Retry-After": "1"})
+    operacoes_pendentes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor_bcrypt, executar_medindo, operacao, funcao, *args)
+    finally:
+        operacoes_pendentes -= 1
+
+
+# Gera o hash de uma senha sem bloquear o event loop
+async def gerar_hash_senha(senha):
+    return await executar_no_pool("hash", pegar_bcrypt_context().hash, senha)
+
+
+# Verifica uma senha contra o hash salvo sem bloquear o event loop
+async def verificar_senha(senha, senha_criptografada):
+    return await executar_no_pool("verify", pegar_bcrypt_context().verify, senha, senha_criptografada)
+
+
+# Chamado na inicialização do worker: o primeiro hash carrega o backend do bcrypt (e faz os testes internos
+# do passlib) antes da primeira requisição de login, em vez de durante ela
+async def aquecer_bcrypt():
+    contexto = pegar_bcrypt_context()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor_bcrypt, contexto.hash, "aquecimento")
\ No newline at end of file
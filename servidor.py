@@ -0,0 +1,40 @@
+# ===========================================
+# INICIALIZAÇÃO DO SERVIDOR EM PRODUÇÃO (VÁRIOS WORKERS)
+# ===========================================
+# Cada worker é um processo separado que monta a aplicação do zero com aplicacao.criar_app (engine, pools e
+# caches próprios, nada é compartilhado entre processos) e só aceita conexões depois do aquecimento feito
+# no lifespan. Ao receber SIGINT/SIGTERM, o uvicorn para de aceitar conexões e espera as requisições em
+# andamento terminarem (até o limite de --timeout-encerramento).
+#
+# As escritas concorrentes no SQLite são tratadas em dependencies.repetir_se_bloqueado (repetição com espera
+# exponencial) somadas ao busy_timeout e ao modo WAL configurados em models.py.
+#
+# Para rodar: python servidor.py --workers 4 --porta 8000
+import argparse
+import os
+import sys
+
+import uvicorn
+
+RAIZ = os.path.abspath(os.path.dirname(__file__))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sobe a API com vários workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--porta", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--timeout-encerramento", type=int, default=int(os.getenv("TIMEOUT_ENCERRAMENTO", "30")),
+                        help="Segundos para as requisições em andamento terminarem ao encerrar")
+    args = parser.parse_args()
+
+    # Permite iniciar o servidor a partir de outra pasta (os workers herdam o sys.path)
+    sys.path.insert(0, RAIZ)
+    uvicorn.run(
+        "aplicacao:criar_app",
+        factory=True,
+        host=args.host,
+        port=args.porta,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.timeout_encerramento,
+        proxy_headers=True,
+    )
\ No newline at end of file
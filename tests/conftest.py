@@ -0,0 +1,56 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Os testes importam os módulos da aplicação a partir da raiz do projeto
+sys.path.insert(0, RAIZ)
+
+# ===========================================
+# MATRIZ DE BANCOS: SQLITE x POSTGRESQL
+# ===========================================
+# Os testes que recebem "url_banco" rodam uma vez em cada banco suportado, cada vez num banco novo e vazio:
+# - SQLite: sempre, num arquivo temporário
+# - PostgreSQL: no servidor de DATABASE_URL_POSTGRES_TESTE ou, sem ela, numa instância local temporária
+#   (pacote opcional "testing.postgresql"); sem nenhum dos dois, os testes do PostgreSQL são pulados.
+#   O banco da URL informada nunca é usado nem apagado: cada teste cria um banco próprio no mesmo servidor.
+BANCOS = ["sqlite", "postgresql"]
+
+
+@pytest.fixture(scope="session")
+def servidor_postgres():
+    url = os.getenv("DATABASE_URL_POSTGRES_TESTE")
+    if url:
+        yield url
+        return
+    try:
+        import testing.postgresql # Dependência opcional: sobe um PostgreSQL local e temporário
+    except ImportError:
+        pytest.skip("PostgreSQL não configurado (defina DATABASE_URL_POSTGRES_TESTE ou instale testing.postgresql)")
+    instancia = testing.postgresql.Postgresql()
+    try:
+        yield instancia.url().replace("postgresql://", "postgresql+psycopg2://")
+    finally:
+        instancia.stop()
+
+
+@pytest.fixture(params=BANCOS)
+def url_banco(request, tmp_path):
+    if request.param == "sqlite":
+        yield f"sqlite:///{tmp_path / 'teste.db'}"
+        return
+    from sqlalchemy import create_engine, make_url, text
+    url = make_url(request.getfixturevalue("servidor_postgres"))
+    nome = f"teste_{uuid.uuid4().hex[:12]}"
+    administracao = create_engine(url, isolation_level="AUTOCOMMIT") # CREATE/DROP DATABASE não rodam numa transação
+    with administracao.connect() as conexao:
+        conexao.execute(text(f'CREATE DATABASE "{nome}"'))
+    try:
+        yield url.set(database=nome).render_as_string(hide_password=False)
+    finally:
+        with administracao.connect() as conexao:
+            conexao.execute(text(f'DROP DATABASE IF EXISTS "{nome}"'))
+        administracao.dispose()
@@ -0,0 +1,60 @@
+# ===========================================
+# FLUXO DA API USADO NA MATRIZ DE BANCOS (tests/test_matriz_bancos.py)
+# ===========================================
+# Executa o fluxo completo da API (cadastro, login, criação de pedido, inclusão e remoção de itens,
+# visualização, listagem e finalização) no banco de DATABASE_URL e imprime os passos em JSON.
+# Roda num processo separado para cada banco: a aplicação cria os engines a partir do DATABASE_URL do
+# processo, exatamente como em produção (engine, migrações do Alembic e rotas reais).
+# O banco recebido deve estar vazio: ele é só migrado para a versão atual (nunca apagado).
+import asyncio
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+
+import httpx
+from alembic import command
+from alembic.config import Config
+
+from aplicacao import criar_app
+
+
+async def executar_fluxo():
+    command.upgrade(Config(os.path.join(RAIZ, "alembic.ini")), "head")
+
+    app = criar_app()
+    passos = []
+    transporte = httpx.ASGITransport(app=app)
+    # O ASGITransport não executa o lifespan, então a inicialização do worker é feita aqui
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transporte, base_url="http://matriz") as cliente:
+        async def chamar(nome, metodo, url, **kwargs):
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, url, **kwargs)
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            passos.append({"passo": nome, "status": resposta.status_code, "corpo": resposta.json(), "ms": duracao_ms})
+            return resposta.json()
+
+        usuario = {"nome": "matriz", "email": "matriz@teste.com", "senha": "senha-matriz", "ativo": True, "admin": True}
+        await chamar("criar_conta", "POST", "/auth/criar_conta", json=usuario)
+        tokens = await chamar("login", "POST", "/auth/login", json={"email": usuario["email"], "senha": usuario["senha"]})
+        cliente.headers["Authorization"] = f"Bearer {tokens['access_token']}"
+        await chamar("criar_pedido", "POST", "/pedidos/pedido", json={"id_usuario": 1})
+        item = {"quantidade": 2, "sabor": "calabresa", "tamanho": "grande", "preco_unitario": 49.9}
+        for _ in range(3):
+            await chamar("adicionar_item", "POST", "/pedidos/pedido/adicionar-item/1", json=item)
+        await chamar("adicionar_itens", "POST", "/pedidos/pedido/adicionar-itens/1", json=[{**item, "preco_unitario": 10.1}] * 10)
+        await chamar("remover_item", "POST", "/pedidos/pedido/remover-item/1")
+        await chamar("visualizar_pedido", "GET", "/pedidos/pedido/1")
+        await chamar("listar", "GET", "/pedidos/listar")
+        await chamar("finalizar_pedido", "POST", "/pedidos/pedido/finalizar/1")
+
+    # Os tokens mudam a cada execução, então não entram na comparação
+    passos[1]["corpo"] = {chave: "<token>" if "token" in chave and chave != "token_type" else valor for chave, valor in passos[1]["corpo"].items()}
+    print(json.dumps(passos))
+
+
+if __name__ == "__main__":
+    asyncio.run(executar_fluxo())
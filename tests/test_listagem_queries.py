@@ -0,0 +1,68 @@
+# ===========================================
+# TESTE: QUANTIDADE DE CONSULTAS SQL NAS LISTAGENS DE PEDIDOS
+# ===========================================
+# Popula um banco novo de cada banco da matriz (fixture "url_banco") com quantidades crescentes de
+# pedidos (cada um com alguns itens) e conta quantas instruções SQL cada rota de listagem executa.
+# A quantidade não pode crescer junto com o número de pedidos (problema N+1).
+#
+# Para rodar (a partir da raiz do projeto): python -m pytest tests/test_listagem_queries.py
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from aplicacao import criar_app
+from dependencies import pegar_sessao_async, verificar_token, UsuarioAutenticado
+from models import Base, Usuario, Pedido, ItemPedido, url_assincrona
+
+ROTAS = ("/pedidos/listar", "/pedidos/listar/pedidos-usuario")
+
+
+async def contar_consultas(url_banco, quantidade_pedidos, itens_por_pedido=3):
+    engine = create_async_engine(url_assincrona(url_banco))
+    fabrica = async_sessionmaker(bind=engine, expire_on_commit=False)
+    # Tabelas recriadas a cada quantidade: os IDs voltam a começar em 1
+    async with engine.begin() as conexao:
+        await conexao.run_sync(Base.metadata.drop_all)
+        await conexao.run_sync(Base.metadata.create_all)
+    async with fabrica() as session:
+        session.add(Usuario("teste", "teste@teste.com", "x", admin=True))
+        await session.flush()
+        for _ in range(quantidade_pedidos):
+            pedido = Pedido(usuario=1)
+            pedido.itens = [ItemPedido(1, "calabresa", "grande", 50.0, None) for _ in range(itens_por_pedido)]
+            session.add(pedido)
+        await session.commit()
+
+    instrucoes = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: instrucoes.append(args[2]))
+
+    async def sessao_teste():
+        async with fabrica() as session:
+            yield session
+
+    # Sem o lifespan: as dependências que usam o banco são trocadas pelas do banco temporário
+    app = criar_app()
+    app.dependency_overrides[pegar_sessao_async] = sessao_teste
+    app.dependency_overrides[verificar_token] = lambda: UsuarioAutenticado(1, True, True)
+    resultado = {}
+    try:
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            for rota in ROTAS:
+                instrucoes.clear()
+                resposta = await cliente.get(rota)
+                resposta.raise_for_status()
+                resultado[rota] = len(instrucoes)
+    finally:
+        await engine.dispose()
+    return resultado
+
+
+@pytest.mark.parametrize("rota", ROTAS)
+def test_consultas_nao_crescem_com_pedidos(rota, url_banco, monkeypatch):
+    monkeypatch.setattr("limite_requisicoes.LIMITE_ATIVO", False)
+    contagens = {quantidade: asyncio.run(contar_consultas(url_banco, quantidade))[rota] for quantidade in (1, 10, 100)}
+    assert len(set(contagens.values())) == 1, f"A quantidade de consultas em {rota} cresce com o número de pedidos (N+1): {contagens}"
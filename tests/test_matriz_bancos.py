@@ -0,0 +1,45 @@
+# ===========================================
+# TESTE: MESMO COMPORTAMENTO NO SQLITE E NO POSTGRESQL
+# ===========================================
+# Roda o fluxo da API (tests/fluxo_api.py) em cada banco da matriz (fixture "url_banco" do conftest.py) e
+# compara as respostas com as de uma execução de referência no SQLite. Os tempos de cada passo aparecem na
+# saída do teste (python -m pytest -s).
+#
+# Para rodar (a partir da raiz do projeto): python -m pytest tests/test_matriz_bancos.py
+# Com PostgreSQL: DATABASE_URL_POSTGRES_TESTE=postgresql+psycopg2://... python -m pytest tests/test_matriz_bancos.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FLUXO = os.path.join(os.path.dirname(__file__), "fluxo_api.py")
+
+
+def executar_fluxo(url):
+    ambiente = {**os.environ, "DATABASE_URL": url, "LIMITE_ATIVO": "false"} # Sem limite de requisições durante o fluxo
+    ambiente.pop("DATABASE_URL_ASYNC", None)
+    saida = subprocess.run([sys.executable, FLUXO], cwd=RAIZ, env=ambiente, capture_output=True, text=True)
+    assert saida.returncode == 0, saida.stderr
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def referencia(tmp_path_factory):
+    return executar_fluxo(f"sqlite:///{tmp_path_factory.mktemp('referencia') / 'referencia.db'}")
+
+
+def test_fluxo_api(url_banco, referencia):
+    passos = executar_fluxo(url_banco)
+    for passo in passos:
+        print(f"{passo['passo']:<20}{passo['ms']:>10.2f} ms")
+    assert [passo["passo"] for passo in passos] == [passo["passo"] for passo in referencia]
+    falhas = [(passo["passo"], passo["status"]) for passo in passos if passo["status"] >= 400]
+    assert not falhas, f"Passos com erro: {falhas}"
+    divergentes = [
+        passo["passo"] for passo, esperado in zip(passos, referencia)
+        if (passo["status"], passo["corpo"]) != (esperado["status"], esperado["corpo"])
+    ]
+    assert not divergentes, f"Respostas diferentes das do SQLite nos passos: {divergentes}"
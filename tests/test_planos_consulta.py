@@ -0,0 +1,63 @@
+# ===========================================
+# TESTE: PLANOS DE CONSULTA DAS BUSCAS MAIS FREQUENTES
+# ===========================================
+# Aplica as migrações do Alembic num banco novo de cada banco da matriz (fixture "url_banco") e roda
+# EXPLAIN nas buscas usadas pelas rotas. Nenhuma delas pode ler a tabela inteira:
+# - SQLite (EXPLAIN QUERY PLAN): "SCAN <tabela>" sem índice;
+# - PostgreSQL (EXPLAIN com enable_seqscan desligado): "Seq Scan", ou seja, nenhum índice serve para a busca
+#   (com as tabelas vazias, o planejador preferiria a leitura sequencial mesmo havendo índice).
+#
+# Para rodar (a partir da raiz do projeto): python -m pytest tests/test_planos_consulta.py
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, select, text
+
+from models import Usuario, Pedido, ItemPedido
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Buscas feitas pelas rotas (login/cadastro, listagem por usuário, carregamento de itens e filtro por status)
+CONSULTAS = {
+    "usuarios.email": select(Usuario).where(Usuario.email == "x"),
+    "pedidos.usuario": select(Pedido).where(Pedido.usuario == 1).order_by(Pedido.id),
+    "itens_pedido.pedido": select(ItemPedido).where(ItemPedido.pedido.in_([1, 2, 3])),
+    "pedidos.status": select(Pedido).where(Pedido.status == "PENDENTE").order_by(Pedido.id),
+}
+
+
+def faz_varredura_completa(dialeto, detalhes):
+    if dialeto == "postgresql":
+        return any("Seq Scan" in detalhe for detalhe in detalhes)
+    # "SCAN tabela" sem "USING INDEX" / "USING COVERING INDEX" indica leitura da tabela inteira
+    return any(detalhe.startswith("SCAN") and "USING" not in detalhe for detalhe in detalhes)
+
+
+def explicar(conexao, sql):
+    if conexao.dialect.name == "postgresql":
+        conexao.execute(text("SET enable_seqscan = off"))
+        return [linha[0] for linha in conexao.execute(text(f"EXPLAIN {sql}"))]
+    return [linha[-1] for linha in conexao.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.fixture
+def engine(url_banco, monkeypatch):
+    # O alembic/env.py usa a URL da variável DATABASE_URL, a mesma lida pela aplicação
+    monkeypatch.setenv("DATABASE_URL", url_banco)
+    command.upgrade(Config(os.path.join(RAIZ, "alembic.ini")), "head")
+    engine = create_engine(url_banco)
+    yield engine
+    engine.dispose()
+
+
+def test_buscas_usam_indice(engine):
+    falhas = {}
+    with engine.connect() as conexao:
+        for nome, consulta in CONSULTAS.items():
+            sql = str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+            detalhes = explicar(conexao, sql)
+            if faz_varredura_completa(engine.dialect.name, detalhes):
+                falhas[nome] = " | ".join(detalhes)
+    assert not falhas, f"Varredura completa de tabela em: {falhas}"